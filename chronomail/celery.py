@@ -7,13 +7,68 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chronomail.settings')
 app = Celery('chronomail', broker=settings.CELERY_BROKER_URL)
 app.autodiscover_tasks()
 
+# Периодические задачи (celery -A chronomail beat)
+app.conf.beat_schedule = {
+    'flush-realtime-metrics': {
+        'task': 'chronomail.celery.flush_realtime_metrics_task',
+        'schedule': getattr(settings, 'METRICS_STORE', {}).get('FLUSH_INTERVAL', 30),
+    },
+    'purge-expired-metrics': {
+        'task': 'chronomail.celery.purge_expired_metrics_task',
+        'schedule': 60 * 60,
+    },
+    'purge-stale-uploads': {
+        'task': 'chronomail.celery.purge_stale_uploads_task',
+        'schedule': 60 * 60,
+    },
+    'purge-unused-payloads': {
+        'task': 'chronomail.celery.purge_unused_payloads_task',
+        'schedule': 24 * 60 * 60,
+    },
+}
+
 # core/tasks.py - обновление для Celery
-from celery import shared_task
+from celery import shared_task  # noqa: E402
+
 
 @shared_task
 def send_time_capsule_async(capsule_id):
+    from core.tasks import send_time_capsule
     return send_time_capsule(capsule_id)
 
+
 @shared_task
 def schedule_capsule_check():
-    return check_and_send_pending_capsules()
\ No newline at end of file
+    from core.tasks import check_and_send_pending_capsules
+    return check_and_send_pending_capsules()
+
+
+@shared_task
+def flush_realtime_metrics_task():
+    # Буфер процесса воркера; веб-процессы сбрасывают свой буфер по таймеру
+    from core.tasks import flush_realtime_metrics
+    return flush_realtime_metrics()
+
+
+@shared_task
+def purge_expired_metrics_task():
+    from core.tasks import purge_expired_metrics
+    return purge_expired_metrics()
+
+
+@shared_task
+def purge_stale_uploads_task():
+    from core.tasks import purge_stale_uploads
+    return purge_stale_uploads()
+
+
+@shared_task
+def purge_unused_payloads_task():
+    from core.tasks import purge_unused_payloads
+    return purge_unused_payloads()
+
+
+@shared_task
+def run_import_job_task(job_id):
+    from core.tasks import run_import_job
+    return run_import_job(job_id)
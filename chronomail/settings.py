@@ -221,7 +221,7 @@ CORS_ALLOW_CREDENTIALS = True
 # REST Framework настройки
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -238,11 +238,61 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'core.api.renderers.ORJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
 
+# Кэш аутентификации по токену API (token -> пользователь), секунды
+AUTH_TOKEN_CACHE = {
+    'TTL': int(os.getenv('AUTH_TOKEN_CACHE_TTL', 60)),
+}
+
+# GeoIP (база GeoLite2-City, открывается один раз на процесс в режиме MMAP)
+GEOIP_DATABASE_PATH = os.getenv('GEOIP_DATABASE_PATH', str(BASE_DIR / 'GeoLite2-City.mmdb'))
+GEOIP_CACHE_SIZE = int(os.getenv('GEOIP_CACHE_SIZE', 10000))
+
+# Метрики в реальном времени: кэш + отложенное сохранение в RealTimeMetrics
+METRICS_STORE = {
+    'PERSIST': os.getenv('METRICS_PERSIST', 'True').lower() == 'true',
+    'FLUSH_INTERVAL': int(os.getenv('METRICS_FLUSH_INTERVAL', 30)),  # секунды
+}
+
+# Время жизни закэшированной статистики (кэш также инвалидируется при изменениях)
+STATS_CACHE_TIMEOUT = int(os.getenv('STATS_CACHE_TIMEOUT', 300))
+
+# Прогноз нагрузки доставки: интервал считается пиком, если капсул в нем
+# не меньше SPIKE_MIN_COUNT и в SPIKE_FACTOR раз больше медианы
+DELIVERY_FORECAST = {
+    'SPIKE_FACTOR': int(os.getenv('FORECAST_SPIKE_FACTOR', 5)),
+    'SPIKE_MIN_COUNT': int(os.getenv('FORECAST_SPIKE_MIN_COUNT', 100)),
+    'MAX_DAYS': 90,
+}
+
+# Возобновляемая загрузка вложений по частям (/api/uploads/)
+ATTACHMENT_UPLOADS = {
+    'PART_SIZE': int(os.getenv('UPLOAD_PART_SIZE', 4 * 1024 * 1024)),  # кратно 64 КБ
+    'MAX_SIZE': int(os.getenv('UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024)),
+    'EXPIRE_HOURS': int(os.getenv('UPLOAD_EXPIRE_HOURS', 24)),
+}
+
+# Брокер Celery (фоновые импорты и периодические задачи)
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+
+# Скомпилированные шаблоны сообщений: LRU процесса по (id шаблона, хэш текста)
+MESSAGE_TEMPLATE_CACHE_SIZE = int(os.getenv('MESSAGE_TEMPLATE_CACHE_SIZE', 256))
+
+# Импорт капсул из CSV: строк в пачке (шифрование, bulk_create, транзакция)
+CSV_IMPORT = {
+    'CHUNK_SIZE': int(os.getenv('CSV_IMPORT_CHUNK_SIZE', 1000)),
+}
+
+# Массовое создание капсул через API (/api/capsules/bulk/)
+CAPSULE_BULK_CREATE = {
+    'MAX_ITEMS': int(os.getenv('BULK_CREATE_MAX_ITEMS', 10000)),
+    'BATCH_SIZE': int(os.getenv('BULK_CREATE_BATCH_SIZE', 1000)),
+}
+
 # Encryption key
 FERNET_KEY = os.getenv('FERNET_KEY', 'your-fernet-key-here-change-in-production')
 
@@ -256,6 +306,32 @@ RATE_LIMIT = {
     'period': 60,
 }
 
+# Временные блокировки IP: решения кэшируются в процессе, изменения
+# распространяются через ключ версии (проверяется раз в VERSION_CHECK_INTERVAL с)
+IP_BLOCK = {
+    'DURATION': 300,
+    'NEGATIVE_TTL': int(os.getenv('IP_BLOCK_NEGATIVE_TTL', 30)),
+    'POSITIVE_TTL': 5,
+    'VERSION_CHECK_INTERVAL': int(os.getenv('IP_BLOCK_VERSION_CHECK_INTERVAL', 2)),
+    'LOCAL_MAX_SIZE': 10000,
+}
+
+# Журнал подозрительных запросов: агрегаты по (IP, путь) в процессе,
+# сброс в кэш атомарными счетчиками по таймеру раз в FLUSH_INTERVAL секунд;
+# MAX_ENTRIES - размер кольцевого индекса агрегатов в кэше
+SUSPICIOUS_REQUESTS = {
+    'BUFFER_SIZE': 1000,
+    'MAX_ENTRIES': 5000,
+    'FLUSH_INTERVAL': int(os.getenv('SUSPICIOUS_FLUSH_INTERVAL', 10)),
+    'TTL': 3600,
+}
+
+# Счетчики ограничения частоты: 'cache' - общий кэш (Redis), 'local' - память процесса
+RATE_LIMITER = {
+    'BACKEND': os.getenv('RATE_LIMITER_BACKEND', 'cache'),
+    'KEY_PREFIX': 'rl',
+}
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -397,6 +473,13 @@ CACHES = {
     }
 }
 
+# Общий кэш для всех воркеров (ограничение частоты, блокировки IP)
+if os.getenv('REDIS_CACHE_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL'),
+    }
+
 # Для Railway - дополнительные настройки
 if IS_RAILWAY:
     # Автоматически определяем домен Railway
@@ -0,0 +1,46 @@
+# core/api/authentication.py
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+import hashlib
+
+
+def get_token_cache_key(key):
+    # В ключе кэша - хэш токена, а не сам токен
+    return f"auth_token:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def invalidate_token(key):
+    cache.delete(get_token_cache_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication с кэшем token -> (id пользователя, дата создания токена).
+    Вместо JOIN Token + User на каждый вызов - выборка пользователя по первичному
+    ключу. Сам пользователь не кэшируется: деактивация и смена прав любым путем
+    (в том числе QuerySet.update) действуют сразу. Удаление токена сбрасывает
+    кэш явно (сигнал в core/signals.py).
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is None:
+            token = self.get_model().objects.filter(key=key).values('user_id', 'created').first()
+            if token is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cached = (token['user_id'], token['created'])
+            cache.set(cache_key, cached, getattr(settings, 'AUTH_TOKEN_CACHE', {}).get('TTL', 60))
+
+        user_id, created = cached
+        user = get_user_model()._default_manager.filter(pk=user_id).first()
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        token = self.get_model()(key=key, user_id=user_id, created=created)
+        token.user = user
+        return user, token
@@ -0,0 +1,30 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson.
+    Типы, которые orjson не знает (Decimal, lazy-строки, даты), кодируются
+    так же, как в стандартном JSONRenderer. Без orjson и при запросе
+    отступов (Accept: application/json; indent=4) работает как JSONRenderer.
+    Нестроковые ключи словарей (числа, None) приводятся к строкам, как в json.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        ret = orjson.dumps(data, default=JSONEncoder().default, option=self.options)
+
+        # Как и JSONRenderer, экранируем разделители строк для совместимости с JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
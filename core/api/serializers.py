@@ -1,7 +1,42 @@
+from collections import Counter
 from rest_framework import serializers
 from rest_framework.authtoken.models import Token
+from django.conf import settings
 from django.contrib.auth import authenticate
-from ..models import TimeCapsule, CapsuleAttachment, MessageTemplate, CustomUser
+from django.db import transaction
+from django.utils import timezone
+from ..attachments import attach_file
+from ..models import (
+    TimeCapsule, CapsuleAttachment, MessageTemplate, CustomUser, AttachmentUpload, CampaignPayload,
+    ImportJob
+)
+
+ENCRYPTED_PREVIEW_STUB = '[Зашифрованное сообщение]'
+
+
+def get_requested_fields(request):
+    """Поля из параметра ?fields=id,status (None - все поля)"""
+    if request is None:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+
+class SparseFieldsetMixin:
+    """Ограничение набора полей ответа параметром ?fields= (только для корневого сериализатора)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if self.parent is not None or kwargs.get('data') is not None:
+            return
+
+        requested = get_requested_fields(self.context.get('request'))
+        if requested:
+            for field_name in set(self.fields) - requested:
+                self.fields.pop(field_name)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -36,7 +71,7 @@ class TokenSerializer(serializers.Serializer):
         }
 
 
-class CapsuleAttachmentSerializer(serializers.ModelSerializer):
+class CapsuleAttachmentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     download_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -48,7 +83,7 @@ class CapsuleAttachmentSerializer(serializers.ModelSerializer):
         return f"/api/attachments/{obj.id}/download/"
 
 
-class TimeCapsuleSerializer(serializers.ModelSerializer):
+class TimeCapsuleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     attachments = CapsuleAttachmentSerializer(many=True, read_only=True)
     message_preview = serializers.SerializerMethodField()
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -63,12 +98,16 @@ class TimeCapsuleSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'sent_at', 'status']
 
     def get_message_preview(self, obj):
-        # Возвращаем превью сообщения (первые 100 символов)
+        # В списках превью не расшифровывается - это стоило бы Fernet-операции на строку.
+        # Превью расшифровывается только при запросе отдельной капсулы
+        view = self.context.get('view')
+        if view is None or getattr(view, 'action', None) != 'retrieve':
+            return ENCRYPTED_PREVIEW_STUB
+
         try:
-            decrypted = obj.decrypt_message()
-            return decrypted[:100] + '...' if len(decrypted) > 100 else decrypted
-        except:
-            return '[Зашифрованное сообщение]'
+            return obj.decrypt_preview()
+        except Exception:
+            return ENCRYPTED_PREVIEW_STUB
 
     def validate_scheduled_date(self, value):
         from django.utils import timezone
@@ -103,13 +142,7 @@ class CreateCapsuleSerializer(serializers.ModelSerializer):
 
         # Обработка вложений
         for file in attachments:
-            CapsuleAttachment.objects.create(
-                capsule=capsule,
-                file=file,
-                file_name=file.name,
-                file_size=file.size,
-                file_type=file.content_type
-            )
+            attach_file(capsule, file)
 
         # Запуск отправки
         from ..tasks import send_time_capsule
@@ -118,24 +151,293 @@ class CreateCapsuleSerializer(serializers.ModelSerializer):
         return capsule
 
 
-class MessageTemplateSerializer(serializers.ModelSerializer):
+class MessageTemplateSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = MessageTemplate
         fields = ['id', 'name', 'content', 'category', 'is_active', 'created_at']
         read_only_fields = ['created_at']
 
 
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    next_part = serializers.IntegerField(read_only=True)
+    part_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = AttachmentUpload
+        fields = [
+            'id', 'file_name', 'file_type', 'total_size', 'part_size', 'part_count',
+            'received_size', 'next_part', 'status', 'created_at'
+        ]
+        read_only_fields = ['id', 'part_size', 'received_size', 'status', 'created_at']
+        extra_kwargs = {'file_type': {'required': False}}
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'csv_file', 'template', 'common_message', 'default_date', 'status',
+            'rows_total', 'rows_done', 'rows_failed', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'rows_total', 'rows_done', 'rows_failed', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        extra_kwargs = {'csv_file': {'write_only': True}}
+
+    def validate_template(self, value):
+        user = self.context['request'].user
+        if value is not None and not (value.is_public or value.created_by_id == user.id):
+            raise serializers.ValidationError('Шаблон недоступен')
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get('template') and not attrs.get('common_message'):
+            raise serializers.ValidationError('Укажите шаблон или общее сообщение')
+        return attrs
+
+    def create(self, validated_data):
+        from ..imports import create_import_job
+        return create_import_job(
+            self.context['request'].user,
+            validated_data['csv_file'],
+            template=validated_data.get('template'),
+            common_message=validated_data.get('common_message', ''),
+            default_date=validated_data.get('default_date'),
+        )
+
+
+class ImportValidationSerializer(serializers.Serializer):
+    """Пробная проверка CSV перед импортом (без создания капсул)"""
+    csv_file = serializers.FileField()
+    default_date = serializers.DateTimeField(required=False, allow_null=True)
+    max_errors = serializers.IntegerField(required=False, min_value=1, max_value=100, default=10)
+
+    def save(self):
+        from ..import_validation import validate_csv
+        return validate_csv(
+            self.validated_data['csv_file'],
+            default_date=self.validated_data.get('default_date'),
+            max_errors=self.validated_data['max_errors'],
+        )
+
+
+class BulkCapsuleItemSerializer(serializers.ModelSerializer):
+    """Элемент массового создания (без вложений)"""
+    message = serializers.CharField(write_only=True, required=False)
+    variables = serializers.DictField(
+        child=serializers.CharField(allow_blank=True, allow_null=True), required=False
+    )
+
+    class Meta:
+        model = TimeCapsule
+        fields = ['recipient_email', 'scheduled_date', 'message', 'variables']
+
+    def validate_scheduled_date(self, value):
+        if value < timezone.now():
+            raise serializers.ValidationError('Нельзя запланировать отправку в прошлое!')
+        return value
+
+
 class BulkCreateSerializer(serializers.Serializer):
-    capsules = CreateCapsuleSerializer(many=True)
+    """
+    Массовое создание капсул.
+    Элементы проверяются по отдельности одним проходом, сообщения шифруются пачкой,
+    валидные капсулы вставляются через bulk_create в одной транзакции.
+    Результат содержит статус каждого элемента (201 или 400 с ошибками).
+    Общее message с подстановками {{ключ}} используется для элементов без своего
+    message: значения берутся из variables элемента (и email получателя).
+    """
+    capsules = serializers.ListField(
+        allow_empty=False,
+        max_length=getattr(settings, 'CAPSULE_BULK_CREATE', {}).get('MAX_ITEMS', 10000)
+    )
+    message = serializers.CharField(required=False)
 
     def create(self, validated_data):
-        capsules_data = validated_data['capsules']
+        from ..encryption import key_manager
+        from ..stats import bump_stats_version
+
+        created_by = validated_data.get('created_by')
+        batch_size = getattr(settings, 'CAPSULE_BULK_CREATE', {}).get('BATCH_SIZE', 1000)
+
+        # Общее сообщение разбирается один раз на весь список
+        common_message = None
+        if validated_data.get('message'):
+            from ..templating import PlaceholderMessage
+            common_message = PlaceholderMessage(validated_data['message'])
+
+        # Один экземпляр сериализатора элемента на весь список
+        item_serializer = BulkCapsuleItemSerializer()
+        message_required = item_serializer.fields['message'].error_messages['required']
+        results = []
+        valid = []
+        for index, item in enumerate(validated_data['capsules']):
+            try:
+                data = item_serializer.run_validation(item)
+            except serializers.ValidationError as e:
+                results.append({'index': index, 'status': 400, 'errors': e.detail})
+                continue
+
+            if 'message' not in data:
+                if common_message is None:
+                    results.append({'index': index, 'status': 400, 'errors': {'message': [message_required]}})
+                    continue
+                values = {'email': data['recipient_email'], **data.get('variables', {})}
+                data['message'] = common_message.render(values)
+
+            result = {'index': index, 'status': 201}
+            results.append(result)
+            valid.append((result, data))
+
+        # Повторяющиеся сообщения (рассылка) хранятся одним общим зашифрованным текстом
+        messages = [data['message'] for _, data in valid]
+        payloads = {
+            message: CampaignPayload.for_message(created_by, message)
+            for message, count in Counter(messages).items() if count > 1
+        }
+
+        unique = [message for message in messages if message not in payloads]
+        encrypted = zip(
+            key_manager.encrypt_many(unique),
+            key_manager.encrypt_many([TimeCapsule.make_preview(m) for m in unique])
+        )
+
         capsules = []
+        for _, data in valid:
+            capsule = TimeCapsule(
+                recipient_email=data['recipient_email'],
+                scheduled_date=data['scheduled_date'],
+                created_by=created_by
+            )
+            payload = payloads.get(data['message'])
+            if payload is not None:
+                capsule.payload = payload
+            else:
+                capsule.encrypted_message, capsule.encrypted_preview = next(encrypted)
+            capsules.append(capsule)
+
+        with transaction.atomic():
+            TimeCapsule.objects.bulk_create(capsules, batch_size=batch_size)
+
+        for (result, _), capsule in zip(valid, capsules):
+            result['id'] = capsule.pk
+
+        # bulk_create не вызывает post_save, статистику инвалидируем явно
+        if capsules:
+            bump_stats_version()
+
+        return {
+            'created': len(capsules),
+            'failed': len(results) - len(capsules),
+            'results': results,
+        }
+
+
+def datetime_to_iso(value):
+    """Дата-время в формате DRF (ISO 8601, UTC как 'Z')"""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class ValuesSerializer:
+    """
+    Быстрая сериализация для списков только на чтение.
+    Работает со строками queryset.values() и заранее собранными преобразователями
+    полей, без создания ModelSerializer и интроспекции полей на каждый запрос.
+    Формат ответа совпадает с соответствующим ModelSerializer.
+    """
+    # {поле ответа: (колонка values() или None, преобразователь или None)}
+    fields = {}
+    # Колонки, которые нужны всегда (например, для пагинации)
+    required_columns = ('id',)
+
+    def __init__(self, requested_fields=None):
+        self.mappers = [
+            (name, column, converter)
+            for name, (column, converter) in self.fields.items()
+            if requested_fields is None or name in requested_fields
+        ]
+        self.field_names = {name for name, _, _ in self.mappers}
+        self.columns = sorted(
+            {column for _, column, _ in self.mappers if column} | set(self.required_columns)
+        )
+
+    def to_representation(self, rows):
+        mappers = self.mappers
+        return [
+            {
+                name: converter(row[column] if column else None) if converter else row[column]
+                for name, column, converter in mappers
+            }
+            for row in rows
+        ]
 
-        for capsule_data in capsules_data:
-            serializer = CreateCapsuleSerializer(data=capsule_data)
-            if serializer.is_valid():
-                capsule = serializer.save()
-                capsules.append(capsule)
 
-        return {'created': len(capsules), 'capsules': capsules}
\ No newline at end of file
+class CapsuleAttachmentValuesSerializer(ValuesSerializer):
+    fields = {
+        'id': ('id', None),
+        'file_name': ('file_name', None),
+        'file_size': ('file_size', None),
+        'file_type': ('file_type', None),
+        'uploaded_at': ('uploaded_at', datetime_to_iso),
+        'download_url': ('id', lambda pk: f"/api/attachments/{pk}/download/"),
+    }
+
+
+class TimeCapsuleValuesSerializer(ValuesSerializer):
+    _status_display = dict(TimeCapsule.STATUS_CHOICES)
+
+    fields = {
+        'id': ('id', None),
+        'recipient_email': ('recipient_email', None),
+        'scheduled_date': ('scheduled_date', datetime_to_iso),
+        'status': ('status', None),
+        'status_display': ('status', lambda value: TimeCapsuleValuesSerializer._status_display.get(value, value)),
+        'created_at': ('created_at', datetime_to_iso),
+        'sent_at': ('sent_at', datetime_to_iso),
+        'failure_reason': ('failure_reason', None),
+        # Вложения заполняются отдельным запросом для всей страницы
+        'attachments': (None, lambda _: []),
+        'message_preview': (None, lambda _: ENCRYPTED_PREVIEW_STUB),
+    }
+    # created_at и id нужны для keyset-пагинации
+    required_columns = ('id', 'created_at')
+
+    def __init__(self, requested_fields=None):
+        super().__init__(requested_fields)
+        self.with_attachments = 'attachments' in self.field_names
+        self.attachment_serializer = CapsuleAttachmentValuesSerializer()
+
+    def to_representation(self, rows):
+        data = super().to_representation(rows)
+        if not self.with_attachments:
+            return data
+
+        by_capsule = {}
+        attachment_rows = CapsuleAttachment.objects.filter(
+            capsule_id__in=[row['id'] for row in rows]
+        ).order_by('id').values('capsule_id', *self.attachment_serializer.columns)
+        for row in attachment_rows:
+            by_capsule.setdefault(row['capsule_id'], []).append(row)
+
+        for row, item in zip(rows, data):
+            item['attachments'] = self.attachment_serializer.to_representation(
+                by_capsule.get(row['id'], [])
+            )
+        return data
+
+
+class MessageTemplateValuesSerializer(ValuesSerializer):
+    fields = {
+        'id': ('id', None),
+        'name': ('name', None),
+        'content': ('content', None),
+        'category': ('category', None),
+        'is_active': ('is_active', None),
+        'created_at': ('created_at', datetime_to_iso),
+    }
@@ -3,9 +3,17 @@ from rest_framework.routers import DefaultRouter
 from . import views
 
 router = DefaultRouter()
-# Позже добавим viewset'ы
+router.register(r'capsules', views.TimeCapsuleViewSet, basename='capsule')
+router.register(r'attachments', views.AttachmentViewSet, basename='attachment')
+router.register(r'templates', views.MessageTemplateViewSet, basename='template')
+router.register(r'uploads', views.AttachmentUploadViewSet, basename='upload')
+router.register(r'imports', views.ImportJobViewSet, basename='import')
 
 urlpatterns = [
+    # До роутера, иначе capsules/bulk/ совпадет с capsules/<pk>/
+    path('capsules/bulk/', views.BulkCapsuleView.as_view(), name='capsule-bulk'),
+    path('stats/', views.StatisticsAPIView.as_view(), name='api-stats'),
+    path('auth/token/', views.CustomAuthToken.as_view(), name='api-token'),
     path('', include(router.urls)),
     path('auth/', include('rest_framework.urls')),
-]
\ No newline at end of file
+]
@@ -1,5 +1,5 @@
 from django.forms import model_to_dict
-from rest_framework import viewsets, status, permissions
+from rest_framework import mixins, viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -7,17 +7,36 @@ from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse
-from ..models import TimeCapsule, CapsuleAttachment, MessageTemplate
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from datetime import datetime, time
+from io import BytesIO
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from ..attachments import build_download_response
+from ..imports import get_job_progress
+from ..models import TimeCapsule, CapsuleAttachment, MessageTemplate, AttachmentUpload, ImportJob
+from ..pagination import KeysetPagination
+from ..uploads import (
+    UploadConflict, UploadError, abort_upload, append_part, complete_upload, start_upload
+)
+from ..stats import get_cached_stats, stats_etag, stats_last_modified
 from .serializers import (
     UserSerializer, TokenSerializer, TimeCapsuleSerializer,
     CreateCapsuleSerializer, MessageTemplateSerializer,
-    BulkCreateSerializer, CapsuleAttachmentSerializer
+    BulkCreateSerializer, CapsuleAttachmentSerializer, get_requested_fields,
+    AttachmentUploadSerializer, ImportJobSerializer, ImportValidationSerializer,
+    TimeCapsuleValuesSerializer, MessageTemplateValuesSerializer
 )
 import json
 
 User = get_user_model()
 
+# Поля вложения, нужные CapsuleAttachmentSerializer (capsule_id - для prefetch)
+ATTACHMENT_LIST_FIELDS = ('id', 'capsule_id', 'file_name', 'file_size', 'file_type', 'uploaded_at')
+
 
 class CustomAuthToken(ObtainAuthToken):
     """Кастомный endpoint для получения токена"""
@@ -41,17 +60,81 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class TimeCapsuleViewSet(viewsets.ModelViewSet):
+class FastListMixin:
+    """
+    Быстрый list(): строки .values() сериализуются через ValuesSerializer
+    вместо ModelSerializer. Остальные действия используют обычный сериализатор.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        values_serializer = self.values_serializer_class(get_requested_fields(request))
+        queryset = self.filter_queryset(self.get_queryset()).values(*values_serializer.columns)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.to_representation(page))
+
+        return Response(values_serializer.to_representation(queryset))
+
+
+class TimeCapsuleViewSet(FastListMixin, viewsets.ModelViewSet):
     """API для управления капсулами времени"""
     serializer_class = TimeCapsuleSerializer
+    values_serializer_class = TimeCapsuleValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # Пользователи видят только свои капсулы
         # Админы видят все
         if self.request.user.is_staff:
-            return TimeCapsule.objects.all()
-        return TimeCapsule.objects.filter(created_by=self.request.user)
+            queryset = TimeCapsule.objects.all()
+        else:
+            queryset = TimeCapsule.objects.filter(created_by=self.request.user)
+
+        if self.action == 'list':
+            # Список сериализуется из .values() (FastListMixin), вложения - одним запросом
+            return self.filter_list_queryset(queryset)
+
+        if self.action == 'retrieve':
+            requested_fields = get_requested_fields(self.request)
+            if requested_fields is None or 'attachments' in requested_fields:
+                queryset = queryset.prefetch_related(Prefetch(
+                    'attachments',
+                    queryset=CapsuleAttachment.objects.only(*ATTACHMENT_LIST_FIELDS)
+                ))
+
+        return queryset
+
+    def filter_list_queryset(self, queryset):
+        """Фильтры ?status=, ?scheduled_after=, ?scheduled_before= (ISO 8601)"""
+        params = self.request.query_params
+
+        statuses = [value for value in params.get('status', '').split(',') if value]
+        if statuses:
+            valid_statuses = dict(TimeCapsule.STATUS_CHOICES)
+            invalid = [value for value in statuses if value not in valid_statuses]
+            if invalid:
+                raise ValidationError({'status': f"Неизвестный статус: {', '.join(invalid)}"})
+            queryset = queryset.filter(status__in=statuses)
+
+        for param, lookup in (('scheduled_after', 'scheduled_date__gte'),
+                              ('scheduled_before', 'scheduled_date__lt')):
+            value = params.get(param)
+            if not value:
+                continue
+            parsed = parse_datetime(value)
+            if parsed is None:
+                parsed_date = parse_date(value)
+                if parsed_date is None:
+                    raise ValidationError({param: 'Ожидается дата в формате ISO 8601'})
+                parsed = datetime.combine(parsed_date, time.min)
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            queryset = queryset.filter(**{lookup: parsed})
+
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -108,9 +191,14 @@ class AttachmentViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        # Только вложения капсул пользователя
-        user_capsules = TimeCapsule.objects.filter(created_by=self.request.user)
-        return CapsuleAttachment.objects.filter(capsule__in=user_capsules)
+        # Только вложения капсул пользователя (JOIN вместо подзапроса)
+        queryset = CapsuleAttachment.objects.filter(
+            capsule__created_by=self.request.user
+        ).order_by('-uploaded_at', '-id')
+
+        if self.action == 'list':
+            return queryset.only(*ATTACHMENT_LIST_FIELDS)
+        return queryset.select_related('capsule', 'blob')
 
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
@@ -118,56 +206,136 @@ class AttachmentViewSet(viewsets.ReadOnlyModelViewSet):
         attachment = self.get_object()
 
         # Проверка прав доступа
-        if not (request.user.is_staff or attachment.capsule.created_by == request.user):
+        if not (request.user.is_staff or attachment.capsule.created_by_id == request.user.id):
             return Response(
                 {'error': 'Доступ запрещен'},
                 status=status.HTTP_403_FORBIDDEN
             )
 
         try:
-            # Дешифрование файла
-            file_data = attachment.decrypt_file()
-
-            # Создание временного файла
-            import tempfile
-            with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-                tmp_file.write(file_data)
-                tmp_file.flush()
-
-            response = FileResponse(
-                open(tmp_file.name, 'rb'),
-                as_attachment=True,
-                filename=attachment.file_name
+            return build_download_response(request, attachment)
+        except Exception as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-            # Удаление временного файла после отправки
-            import os
-            response.callback = lambda: os.unlink(tmp_file.name)
 
-            return response
+class AttachmentUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                              mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Возобновляемая загрузка вложений частями:
+    POST /uploads/ -> PUT /uploads/{id}/parts/{n}/ (тело - байты части) -> POST /uploads/{id}/complete/.
+    GET /uploads/{id}/ показывает, с какой части продолжить после обрыва связи.
+    """
+    serializer_class = AttachmentUploadSerializer
+    permission_classes = [permissions.IsAuthenticated]
 
-        except Exception as e:
+    def get_queryset(self):
+        return AttachmentUpload.objects.filter(created_by=self.request.user)
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        try:
+            serializer.instance = start_upload(
+                self.request.user, data['file_name'], data.get('file_type'), data['total_size']
+            )
+        except UploadError as e:
+            raise ValidationError({'total_size': [str(e)]})
+
+    def perform_destroy(self, instance):
+        abort_upload(instance)
+
+    @action(detail=True, methods=['put'], url_path=r'parts/(?P<index>\d+)')
+    def parts(self, request, pk=None, index=None):
+        """Прием одной части (application/octet-stream)"""
+        upload = self.get_object()
+
+        try:
+            if request.META.get('CONTENT_LENGTH'):
+                length, stream = int(request.META['CONTENT_LENGTH']), request.stream or BytesIO()
+            else:
+                # Chunked transfer encoding: Django считает тело пустым, поэтому часть
+                # читается из wsgi.input не больше заявленного размера части
+                length, stream = None, request.META.get('wsgi.input') or BytesIO()
+            upload, part_sha256 = append_part(
+                upload, int(index), stream,
+                length=length,
+                expected_sha256=request.headers.get('X-Part-SHA256')
+            )
+        except UploadConflict as e:
             return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': str(e), 'next_part': upload.next_part},
+                status=status.HTTP_409_CONFLICT
+            )
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = self.get_serializer(upload).data
+        data['part_sha256'] = part_sha256
+        return Response(data)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        """Завершение загрузки; с capsule - сразу прикрепить к капсуле"""
+        upload = self.get_object()
+
+        capsule = None
+        if request.data.get('capsule'):
+            capsule = get_object_or_404(
+                TimeCapsule, pk=request.data['capsule'], created_by=request.user
             )
 
+        try:
+            result = complete_upload(upload, capsule)
+        except UploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        if capsule is not None:
+            return Response(CapsuleAttachmentSerializer(result).data, status=status.HTTP_201_CREATED)
+        return Response(self.get_serializer(result).data)
 
-class MessageTemplateViewSet(viewsets.ModelViewSet):
+
+class MessageTemplateViewSet(FastListMixin, viewsets.ModelViewSet):
     """API для работы с шаблонами сообщений"""
     serializer_class = MessageTemplateSerializer
+    values_serializer_class = MessageTemplateValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         # Пользовательские шаблоны + общие
         return MessageTemplate.objects.filter(
-            created_by=self.request.user
-        ) | MessageTemplate.objects.filter(is_public=True)
+            Q(created_by=self.request.user) | Q(is_public=True)
+        )
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
 
+class ImportJobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
+                       mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Фоновый импорт капсул из CSV: создание задания и опрос прогресса"""
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ImportJob.objects.filter(created_by=self.request.user).select_related('template')
+
+    def retrieve(self, request, *args, **kwargs):
+        # Прогресс опрашивается часто: один SELECT нужных колонок
+        progress = get_job_progress(request.user, kwargs['pk'])
+        if progress is None:
+            raise NotFound('Импорт не найден')
+        return Response(progress)
+
+    @action(detail=False, methods=['post'], serializer_class=ImportValidationSerializer)
+    def validate(self, request):
+        """Пробный прогон: сводка ошибок CSV без создания задания"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save())
+
+
 class BulkCapsuleView(APIView):
     """API для массового создания капсул"""
     permission_classes = [permissions.IsAuthenticated]
@@ -176,8 +344,16 @@ class BulkCapsuleView(APIView):
         serializer = BulkCreateSerializer(data=request.data)
 
         if serializer.is_valid():
-            result = serializer.save()
-            return Response(result, status=status.HTTP_201_CREATED)
+            result = serializer.save(created_by=request.user)
+
+            # 201 - созданы все, 207 - часть элементов с ошибками, 400 - ни одного
+            if not result['failed']:
+                response_status = status.HTTP_201_CREATED
+            elif result['created']:
+                response_status = status.HTTP_207_MULTI_STATUS
+            else:
+                response_status = status.HTTP_400_BAD_REQUEST
+            return Response(result, status=response_status)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -186,28 +362,60 @@ class StatisticsAPIView(APIView):
     """API для получения статистики"""
     permission_classes = [permissions.IsAuthenticated]
 
+    @method_decorator(condition(etag_func=stats_etag, last_modified_func=stats_last_modified))
     def get(self, request):
+        # Тип статистики
+        stats_type = request.GET.get('type', 'summary')
+        date_str = request.GET.get('date', '')
+
+        if stats_type == 'forecast':
+            return self.get_forecast(request)
+
+        if stats_type not in ('summary', 'daily', 'dashboard'):
+            return Response({})
+
+        data = get_cached_stats(
+            f"api:{stats_type}:{date_str}",
+            lambda: self.build_statistics(stats_type, date_str)
+        )
+
+        return Response(data)
+
+    def get_forecast(self, request):
+        """Прогноз нагрузки доставки по scheduled_date ожидающих капсул"""
+        from django.conf import settings
+        from ..stats import StatisticsCollector, FORECAST_GRANULARITIES
+
+        max_days = getattr(settings, 'DELIVERY_FORECAST', {}).get('MAX_DAYS', 90)
+        granularity = request.GET.get('granularity', 'hour')
+
+        try:
+            days = int(request.GET.get('days', 7))
+        except ValueError:
+            days = 0
+
+        if not 1 <= days <= max_days or granularity not in FORECAST_GRANULARITIES:
+            return Response(
+                {'error': f'days: 1-{max_days}, granularity: {", ".join(FORECAST_GRANULARITIES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = StatisticsCollector().get_delivery_forecast(days=days, granularity=granularity)
+        return Response(data)
+
+    def build_statistics(self, stats_type, date_str):
+        """Расчет статистики при промахе кэша"""
         from ..stats import StatisticsCollector
 
         collector = StatisticsCollector()
 
-        # Тип статистики
-        stats_type = request.GET.get('type', 'summary')
-
         if stats_type == 'summary':
-            data = collector.update_realtime_metrics()
+            return collector.update_realtime_metrics()
         elif stats_type == 'daily':
-            date_str = request.GET.get('date')
+            date = None
             if date_str:
                 from datetime import datetime
                 date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                stat = collector.collect_daily_stats(date)
-                data = model_to_dict(stat) if stat else {}
-            else:
-                data = collector.collect_daily_stats()
-        elif stats_type == 'dashboard':
-            data = collector.get_statistics_dashboard()
-        else:
-            data = {}
-
-        return Response(data)
\ No newline at end of file
+            stat = collector.collect_daily_stats(date)
+            return model_to_dict(stat) if stat else {}
+        return collector.get_statistics_dashboard()
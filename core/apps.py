@@ -8,6 +8,8 @@ class CoreConfig(AppConfig):
     def ready(self):
         """Выполняется при запуске приложения"""
         # Импорт здесь, чтобы избежать циклических импортов
+        from . import signals  # noqa: F401
+
         try:
             from .encryption import key_manager
             # Менеджер ключей уже инициализирован при импорте
@@ -0,0 +1,280 @@
+# core/attachments.py
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils.http import content_disposition_header
+import hashlib
+import tempfile
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Размер блока открытого текста. Файл хранится как последовательность
+# Fernet-токенов (по одному на блок, через перевод строки). Все полные блоки
+# шифруются в токены одинаковой длины, поэтому к любому байту можно перейти
+# через seek и расшифровать только нужные блоки (HTTP Range).
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+
+# Буфер зашифрованного файла перед записью в хранилище (больше - на диск)
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_encrypted_block_size = None
+
+
+def get_encrypted_block_size():
+    """Длина зашифрованного полного блока в хранилище (токен + перевод строки)"""
+    global _encrypted_block_size
+    if _encrypted_block_size is None:
+        from cryptography.fernet import Fernet
+        token = Fernet(Fernet.generate_key()).encrypt(b'\0' * ATTACHMENT_CHUNK_SIZE)
+        _encrypted_block_size = len(token) + 1
+    return _encrypted_block_size
+
+
+def next_content_hash(content_hash, block):
+    """
+    Следующее значение цепочки хэшей содержимого:
+    sha256(предыдущий хэш + sha256(блок)) по блокам ATTACHMENT_CHUNK_SIZE.
+    Состояние - 32 байта, поэтому его можно хранить между запросами загрузки.
+    """
+    digest = hashlib.sha256(block).digest()
+    return hashlib.sha256(bytes.fromhex(content_hash) + digest).hexdigest()
+
+
+def encrypt_blocks(source, fernet, out, limit=None, content_hash=''):
+    """
+    Поблочное шифрование source (read()) в out (write()).
+    Читает не больше limit байт. Возвращает (байт открытого текста, хэш содержимого).
+    """
+    size = 0
+    while limit is None or size < limit:
+        to_read = ATTACHMENT_CHUNK_SIZE if limit is None else min(ATTACHMENT_CHUNK_SIZE, limit - size)
+        block = source.read(to_read)
+        # Поток может отдавать данные меньшими порциями: добираем до полного блока
+        while block and len(block) < to_read:
+            more = source.read(to_read - len(block))
+            if not more:
+                break
+            block += more
+        if not block:
+            break
+
+        size += len(block)
+        content_hash = next_content_hash(content_hash, block)
+        out.write(fernet.encrypt(block) + b'\n')
+
+    return size, content_hash
+
+
+def reference_blob(content_hash):
+    """Новая ссылка на существующий блоб (None, если такого содержимого нет)"""
+    from .models import AttachmentBlob
+
+    with transaction.atomic():
+        blob = AttachmentBlob.objects.select_for_update().filter(content_hash=content_hash).first()
+        if blob is not None:
+            blob.ref_count += 1
+            blob.save(update_fields=['ref_count'])
+    return blob
+
+
+def create_blob(content_hash, size, key_id, content=None, name=None):
+    """
+    Создание блоба с одной ссылкой: из content (файл) или из уже записанного
+    в хранилище файла name. При гонке с таким же содержимым файл удаляется,
+    а возвращается ссылка на блоб, созданный параллельно.
+    """
+    from .models import AttachmentBlob
+
+    blob = AttachmentBlob(
+        content_hash=content_hash, size=size, encryption_key_id=key_id, ref_count=1
+    )
+    if content is not None:
+        blob.file.save(f"{content_hash[:2]}/{content_hash}", content, save=False)
+    else:
+        blob.file.name = name
+
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        blob.file.storage.delete(blob.file.name)
+        return reference_blob(content_hash)
+    return blob
+
+
+def adopt_blob(content_hash, size, key_id, name):
+    """Блоб для файла, уже зашифрованного в хранилище (загрузка по частям)"""
+    blob = reference_blob(content_hash)
+    if blob is None:
+        return create_blob(content_hash, size, key_id, name=name)
+
+    # Такое содержимое уже хранится: копия не нужна
+    blob.file.storage.delete(name)
+    return blob
+
+
+def store_blob(file):
+    """
+    Поблочное шифрование загруженного файла в буфер и поиск блоба по хэшу.
+    Если такое содержимое уже есть, буфер отбрасывается и берется ссылка.
+    """
+    from .encryption import key_manager
+
+    key_id = key_manager.current_key_id
+    fernet = key_manager.get_fernet(key_id)
+
+    file.seek(0)
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+        size, content_hash = encrypt_blocks(file, fernet, buffer)
+
+        blob = reference_blob(content_hash)
+        if blob is None:
+            buffer.seek(0)
+            blob = create_blob(content_hash, size, key_id, content=File(buffer))
+    return blob
+
+
+def create_attachment(capsule, blob, file_name, file_type):
+    """Вложение капсулы, ссылающееся на блоб (ссылка уже учтена в ref_count)"""
+    from .models import CapsuleAttachment
+
+    return CapsuleAttachment.objects.create(
+        capsule=capsule,
+        blob=blob,
+        file_name=file_name,
+        file_size=blob.size,
+        file_type=file_type or 'application/octet-stream',
+        is_encrypted=True,
+        encryption_key_id=blob.encryption_key_id,
+    )
+
+
+def attach_file(capsule, file):
+    """Шифрование, дедупликация и прикрепление загруженного файла к капсуле"""
+    return create_attachment(capsule, store_blob(file), file.name, file.content_type)
+
+
+def release_blob(blob_id):
+    """Снятие ссылки на блоб; последняя ссылка удаляет блоб (и файл через django_cleanup)"""
+    from .models import AttachmentBlob
+
+    with transaction.atomic():
+        blob = AttachmentBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count <= 1 and not blob.attachments.exists():
+            blob.delete()
+            logger.info(f"Удален блоб вложения {blob.content_hash}")
+        else:
+            blob.ref_count = max(blob.ref_count - 1, 0)
+            blob.save(update_fields=['ref_count'])
+
+
+def iter_plain(attachment, start, end):
+    """Генератор байтов [start, end] незашифрованного файла"""
+    with attachment.stored_file.open('rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(ATTACHMENT_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def iter_decrypted(attachment, start, end):
+    """
+    Генератор расшифрованных байтов [start, end].
+    Читаются и расшифровываются только блоки, попадающие в диапазон,
+    в памяти одновременно находится не больше одного блока.
+    """
+    from .encryption import key_manager
+
+    fernet = key_manager.get_fernet(attachment.encryption_key_id)
+    block_size = get_encrypted_block_size()
+    first, last = start // ATTACHMENT_CHUNK_SIZE, end // ATTACHMENT_CHUNK_SIZE
+
+    with attachment.stored_file.open('rb') as f:
+        f.seek(first * block_size)
+        for index in range(first, last + 1):
+            token = f.read(block_size).rstrip(b'\n')
+            if not token:
+                break
+            chunk = fernet.decrypt(token)
+
+            offset = index * ATTACHMENT_CHUNK_SIZE
+            lo = start - offset if index == first else 0
+            hi = end - offset + 1 if index == last else len(chunk)
+            yield chunk[lo:hi]
+
+
+def parse_range(header, size):
+    """
+    Разбор заголовка Range (один диапазон байтов).
+    Возвращает (start, end), None - отдать файл целиком,
+    или бросает ValueError, если диапазон невыполним (416).
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or size == 0:
+        # Несколько диапазонов и неизвестные единицы игнорируются
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # bytes=-N: последние N байт
+        length = int(last)
+        if length == 0:
+            raise ValueError('Пустой диапазон')
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('Диапазон за пределами файла')
+    return start, end
+
+
+def attachment_etag(attachment):
+    return f'"{attachment.pk}-{attachment.file_size}-{int(attachment.uploaded_at.timestamp())}"'
+
+
+def build_download_response(request, attachment):
+    """
+    Потоковая отдача вложения с поддержкой Range (206 Partial Content).
+    Файл не загружается в память целиком и не копируется во временные файлы.
+    """
+    size = attachment.file_size
+    etag = attachment_etag(attachment)
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = StreamingHttpResponse([], status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    iterator = iter_decrypted if attachment.is_encrypted else iter_plain
+    response = StreamingHttpResponse(
+        iterator(attachment, start, end) if size else iter([]),
+        status=206 if byte_range else 200,
+        content_type=attachment.file_type or 'application/octet-stream'
+    )
+    response['Content-Length'] = str(end - start + 1 if size else 0)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = content_disposition_header(True, attachment.file_name)
+    if byte_range:
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    return response
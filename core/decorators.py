@@ -1,9 +1,8 @@
 # core/decorators.py
 from functools import wraps
-from django.core.cache import cache
-from django.utils import timezone
 from django.http import HttpResponseForbidden
-import time
+
+from .ratelimit import parse_rate, rate_limiter
 
 
 def rate_limit(rate='5/m', key='ip', block=True):
@@ -17,39 +16,29 @@ def rate_limit(rate='5/m', key='ip', block=True):
         @wraps(view_func)
         def wrapped(request, *args, **kwargs):
             # Парсинг параметров лимита
-            count, period = rate.split('/')
-            count = int(count)
-
-            # Определение периода в секундах
-            period_map = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
-            period_seconds = period_map.get(period.lower(), 60)
+            count, period_seconds = parse_rate(rate)
 
-            # Определение ключа для кэша
+            # Определение ключа для счетчика
             if key == 'ip':
                 x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
                 if x_forwarded_for:
                     client_ip = x_forwarded_for.split(',')[0]
                 else:
                     client_ip = request.META.get('REMOTE_ADDR')
-                cache_key = f"rate_limit_{view_func.__name__}_{client_ip}"
+                limit_key = f"view:{view_func.__name__}:{client_ip}"
             elif key == 'user':
                 if request.user.is_authenticated:
-                    cache_key = f"rate_limit_{view_func.__name__}_{request.user.id}"
+                    limit_key = f"view:{view_func.__name__}:user:{request.user.id}"
                 else:
                     return view_func(request, *args, **kwargs)
             else:
-                cache_key = f"rate_limit_{view_func.__name__}_{request.session.session_key}"
+                limit_key = f"view:{view_func.__name__}:session:{request.session.session_key}"
 
-            # Проверка лимита
-            requests = cache.get(cache_key, [])
-            now = timezone.now()
-
-            # Удаление старых запросов
-            requests = [req_time for req_time in requests
-                        if (now - req_time).seconds < period_seconds]
+            # Проверка лимита (общий с IPFilterMiddleware атомарный счетчик)
+            result = rate_limiter.hit(limit_key, count, period_seconds)
 
             # Проверка превышения лимита
-            if len(requests) >= count:
+            if not result.allowed:
                 if block:
                     return HttpResponseForbidden(
                         "Превышен лимит запросов. Пожалуйста, подождите."
@@ -59,18 +48,14 @@ def rate_limit(rate='5/m', key='ip', block=True):
                     response = HttpResponseForbidden("Превышен лимит")
                     response['X-RateLimit-Limit'] = count
                     response['X-RateLimit-Remaining'] = 0
-                    response['X-RateLimit-Reset'] = int(requests[0].timestamp()) + period_seconds
+                    response['X-RateLimit-Reset'] = result.reset
                     return response
 
-            # Добавление текущего запроса
-            requests.append(now)
-            cache.set(cache_key, requests, period_seconds)
-
             # Добавление заголовков
             response = view_func(request, *args, **kwargs)
             response['X-RateLimit-Limit'] = count
-            response['X-RateLimit-Remaining'] = count - len(requests)
-            response['X-RateLimit-Reset'] = int(now.timestamp()) + period_seconds
+            response['X-RateLimit-Remaining'] = result.remaining
+            response['X-RateLimit-Reset'] = result.reset
 
             return response
 
@@ -52,6 +52,25 @@ class SimpleKeyManager:
         # Возвращаем с идентификатором ключа
         return f"{key_id}:{encrypted.decode()}"
 
+    def get_fernet(self, key_id=None):
+        """Экземпляр Fernet для ключа (для потокового шифрования файлов)"""
+        key_id = key_id or self.current_key_id
+        if key_id not in self.keys:
+            raise ValueError(f"Ключ {key_id} не найден")
+        return Fernet(self.keys[key_id]['key'])
+
+    def encrypt_many(self, values, key_id=None):
+        """Пакетное шифрование: один экземпляр Fernet на весь список"""
+        key_id = key_id or self.current_key_id
+        if key_id not in self.keys:
+            raise ValueError(f"Ключ {key_id} не найден")
+
+        fernet = Fernet(self.keys[key_id]['key'])
+        encrypted = [f"{key_id}:{fernet.encrypt(value.encode()).decode()}" for value in values]
+
+        self.keys[key_id]['usage_count'] = self.keys[key_id].get('usage_count', 0) + len(encrypted)
+        return encrypted
+
     def decrypt_with_key_id(self, encrypted_data):
         """Дешифрование с автоматическим определением ключа"""
         if ':' in encrypted_data:
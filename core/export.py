@@ -0,0 +1,154 @@
+# core/export.py
+from django.core.serializers.json import DjangoJSONEncoder
+import csv
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Размер пачки для серверного курсора (.iterator) и для батчей Parquet
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Поля наборов данных. Текст сообщений не экспортируется никогда
+EXPORT_DATASETS = {
+    'rollups': [
+        'date', 'total_created', 'total_sent', 'total_failed', 'total_pending',
+        'avg_delivery_time', 'max_delivery_time', 'unique_recipients',
+        'top_domains', 'countries',
+    ],
+    'capsules': [
+        'id', 'recipient_email', 'scheduled_date', 'status', 'created_at',
+        'sent_at', 'created_by_id',
+    ],
+}
+
+# JSON-поля сериализуются в строку в CSV и Parquet
+EXPORT_JSON_FIELDS = {'top_domains', 'countries'}
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def get_export_queryset(dataset, user=None):
+    """Queryset набора данных (user=None - без ограничения по владельцу)"""
+    from .models import CapsuleStatistics, TimeCapsule
+
+    if dataset == 'rollups':
+        queryset = CapsuleStatistics.objects.order_by('date')
+    elif dataset == 'capsules':
+        queryset = TimeCapsule.objects.order_by('id')
+        if user is not None:
+            queryset = queryset.filter(created_by=user)
+    else:
+        raise ValueError(f"Неизвестный набор данных: {dataset}")
+
+    return queryset.values_list(*EXPORT_DATASETS[dataset])
+
+
+def iter_rows(dataset, user=None):
+    """Построчное чтение через серверный курсор, память не зависит от объема"""
+    return get_export_queryset(dataset, user).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def stream_csv(dataset, user=None):
+    """Генератор строк CSV (с заголовком)"""
+    fields = EXPORT_DATASETS[dataset]
+    json_columns = {i for i, field in enumerate(fields) if field in EXPORT_JSON_FIELDS}
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+
+    for row in iter_rows(dataset, user):
+        if json_columns:
+            row = [
+                json.dumps(value, ensure_ascii=False) if i in json_columns else value
+                for i, value in enumerate(row)
+            ]
+        yield writer.writerow(row)
+
+
+def stream_ndjson(dataset, user=None):
+    """Генератор строк NDJSON (один JSON-объект на строку)"""
+    fields = EXPORT_DATASETS[dataset]
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    for row in iter_rows(dataset, user):
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+def stream_export(dataset, export_format, user=None):
+    """Генератор экспорта в текстовом формате (csv или ndjson)"""
+    if export_format == 'csv':
+        return stream_csv(dataset, user)
+    if export_format == 'ndjson':
+        return stream_ndjson(dataset, user)
+    raise ValueError(f"Неизвестный формат: {export_format}")
+
+
+def write_parquet(dataset, path, user=None):
+    """
+    Экспорт в колоночный файл Parquet для аналитиков.
+    Строки пишутся пачками по EXPORT_CHUNK_SIZE, поэтому память ограничена.
+    Требует pyarrow (есть в requirements.txt).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Для экспорта в Parquet установите pyarrow")
+
+    fields = EXPORT_DATASETS[dataset]
+    json_columns = {i for i, field in enumerate(fields) if field in EXPORT_JSON_FIELDS}
+    model = get_export_queryset(dataset).model
+
+    # Схема строится по типам полей модели, а не по первой пачке данных
+    arrow_types = {
+        'DateTimeField': pa.timestamp('us', tz='UTC'),
+        'DateField': pa.date32(),
+        'FloatField': pa.float64(),
+        'IntegerField': pa.int64(),
+        'BigIntegerField': pa.int64(),
+        'BigAutoField': pa.int64(),
+        'AutoField': pa.int64(),
+        'ForeignKey': pa.int64(),
+    }
+    schema = pa.schema([
+        (field, arrow_types.get(model._meta.get_field(field).get_internal_type(), pa.string()))
+        for field in fields
+    ])
+    writer = pq.ParquetWriter(path, schema)
+    written = 0
+
+    def write_chunk(chunk):
+        arrays = []
+        for i, column in enumerate(zip(*chunk)):
+            if i in json_columns:
+                column = [json.dumps(v, ensure_ascii=False) for v in column]
+            arrays.append(pa.array(column, type=schema.field(i).type))
+        writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+    try:
+        chunk = []
+        for row in iter_rows(dataset, user):
+            chunk.append(row)
+            if len(chunk) >= EXPORT_CHUNK_SIZE:
+                write_chunk(chunk)
+                written += len(chunk)
+                chunk = []
+
+        if chunk:
+            write_chunk(chunk)
+            written += len(chunk)
+    finally:
+        writer.close()
+
+    logger.info(f"Экспорт {dataset} в Parquet: {written} строк -> {path}")
+    return written
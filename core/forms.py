@@ -2,9 +2,12 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from .models import TimeCapsule, CapsuleAttachment
+from .attachments import attach_file
+from .models import TimeCapsule, AttachmentUpload
+from .uploads import attach_upload
 from ckeditor.widgets import CKEditorWidget
 from django.core.validators import FileExtensionValidator
+import uuid
 
 
 class TimeCapsuleForm(forms.ModelForm):
@@ -38,6 +41,9 @@ class TimeCapsuleForm(forms.ModelForm):
         ]
     )
 
+    # Id завершенных загрузок по частям (/api/uploads/), через запятую
+    upload_ids = forms.CharField(widget=forms.HiddenInput, required=False)
+
     class Meta:
         model = TimeCapsule
         fields = ['recipient_email', 'scheduled_date']
@@ -72,6 +78,22 @@ class TimeCapsuleForm(forms.ModelForm):
             raise ValidationError('Нельзя запланировать отправку в прошлом!')
         return scheduled_date
 
+    def clean_upload_ids(self):
+        upload_ids = [value.strip() for value in self.cleaned_data.get('upload_ids', '').split(',') if value.strip()]
+        try:
+            return [uuid.UUID(value) for value in upload_ids]
+        except ValueError:
+            raise ValidationError('Некорректный идентификатор загрузки')
+
+    def get_completed_uploads(self):
+        """Завершенные загрузки пользователя из upload_ids"""
+        upload_ids = self.cleaned_data.get('upload_ids')
+        if not upload_ids or not self.user:
+            return AttachmentUpload.objects.none()
+        return AttachmentUpload.objects.filter(
+            id__in=upload_ids, created_by=self.user, status='complete'
+        )
+
     def save(self, commit=True):
         """Сохраняет капсулу с шифрованием сообщения"""
         capsule = super().save(commit=False)
@@ -89,14 +111,12 @@ class TimeCapsuleForm(forms.ModelForm):
 
             # Обрабатываем вложения
             attachments = self.files.getlist('attachments')
-            for attachment in attachments:
-                CapsuleAttachment.objects.create(
-                    capsule=capsule,
-                    file=attachment,
-                    file_name=attachment.name,
-                    file_size=attachment.size,
-                    file_type=attachment.content_type or 'application/octet-stream'
-                )
+            for file in attachments:
+                attach_file(capsule, file)
+
+            # Файлы, уже загруженные по частям, прикрепляются без копирования
+            for upload in self.get_completed_uploads():
+                attach_upload(upload, capsule)
 
         return capsule
 
@@ -0,0 +1,65 @@
+# core/geoip.py
+from functools import lru_cache
+from django.conf import settings
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_reader = None
+_reader_loaded = False
+_reader_lock = threading.Lock()
+
+
+def get_reader():
+    """
+    Общий для процесса GeoIP reader.
+    Создается лениво при первом обращении и открывает базу в режиме MODE_MMAP,
+    поэтому файл отображается в память один раз и разделяется между потоками.
+    """
+    global _reader, _reader_loaded
+
+    if _reader_loaded:
+        return _reader
+
+    with _reader_lock:
+        if not _reader_loaded:
+            try:
+                import geoip2.database
+                from maxminddb import MODE_MMAP
+
+                path = getattr(settings, 'GEOIP_DATABASE_PATH', 'GeoLite2-City.mmdb')
+                _reader = geoip2.database.Reader(str(path), mode=MODE_MMAP)
+                logger.info(f"GeoIP база данных загружена: {path}")
+            except Exception as e:
+                _reader = None
+                logger.warning(f"GeoIP база данных не найдена: {e}")
+            _reader_loaded = True
+
+    return _reader
+
+
+@lru_cache(maxsize=getattr(settings, 'GEOIP_CACHE_SIZE', 10000))
+def lookup_country(ip):
+    """Определение страны по IP с LRU-кэшем (ISO-код или 'Unknown')"""
+    reader = get_reader()
+    if not reader or not ip:
+        return 'Unknown'
+
+    try:
+        return reader.city(ip).country.iso_code or 'Unknown'
+    except Exception:
+        # AddressNotFoundError, некорректный или приватный адрес
+        return 'Unknown'
+
+
+def reset_reader():
+    """Закрытие reader и сброс кэша (например, после обновления базы)"""
+    global _reader, _reader_loaded
+
+    with _reader_lock:
+        if _reader:
+            _reader.close()
+        _reader = None
+        _reader_loaded = False
+        lookup_country.cache_clear()
@@ -0,0 +1,210 @@
+# core/import_validation.py
+from collections import Counter
+from django.conf import settings
+from django.utils import timezone
+from io import TextIOWrapper
+import csv
+import logging
+
+from .imports import EMAIL_RE, parse_row_date
+
+logger = logging.getLogger(__name__)
+
+# Категории ошибок пробного прогона (строка не будет импортирована)
+ERROR_CATEGORIES = ('missing_email', 'invalid_email', 'missing_date', 'invalid_date', 'past_date')
+
+# Предупреждения (строка будет импортирована)
+WARNING_CATEGORIES = ('duplicate_email',)
+
+CATEGORY_LABELS = {
+    'missing_email': 'Отсутствует email',
+    'invalid_email': 'Неверный email',
+    'missing_date': 'Не указана дата отправки',
+    'invalid_date': 'Неверная дата',
+    'past_date': 'Дата отправки в прошлом',
+    'duplicate_email': 'Повторяющиеся получатели',
+}
+
+DEFAULT_MAX_ERRORS = 10
+
+
+def validate_csv(file, default_date=None, max_errors=DEFAULT_MAX_ERRORS):
+    """
+    Пробная проверка CSV перед импортом, по колонкам целиком, без создания капсул.
+    Проверяет email (тем же регулярным выражением, что и импорт), даты
+    (ISO 8601, наивные - в часовом поясе проекта), даты в прошлом и повторы получателей.
+    Возвращает сводку: число строк, счетчики по категориям и первые max_errors примеров.
+    Колонки обрабатываются векторно через pyarrow (есть в requirements.txt).
+    Без pyarrow - деградированный режим: построчная проверка в Python, с предупреждением в лог.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.warning("pyarrow не установлен: проверка CSV выполняется построчно в Python (медленно)")
+        return _validate_python(file, default_date, max_errors)
+    return _validate_arrow(file, default_date, max_errors)
+
+
+def _summary(rows, counts, samples):
+    def section(categories):
+        return {
+            category: {
+                'label': CATEGORY_LABELS[category],
+                'count': counts[category],
+                'samples': samples[category],
+            }
+            for category in categories
+        }
+
+    invalid = sum(counts[category] for category in ERROR_CATEGORIES)
+    return {
+        'rows': rows,
+        'valid': rows - invalid,
+        'invalid': invalid,
+        'errors': section(ERROR_CATEGORIES),
+        'warnings': section(WARNING_CATEGORIES),
+    }
+
+
+def _validate_arrow(file, default_date, max_errors):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+
+    file.seek(0)
+    table = pacsv.read_csv(
+        file,
+        convert_options=pacsv.ConvertOptions(
+            column_types={'email': pa.string(), 'date': pa.string()},
+            include_columns=['email', 'date'],
+            include_missing_columns=True,
+            strings_can_be_null=False,
+        ),
+    )
+    rows = table.num_rows
+    now = pa.scalar(timezone.now(), type=pa.timestamp('us', tz='UTC'))
+
+    email = pc.utf8_trim_whitespace(pc.cast(table['email'], pa.string()))
+    has_email = pc.fill_null(pc.greater(pc.utf8_length(email), 0), False)
+    email_ok = pc.fill_null(pc.match_substring_regex(email, EMAIL_RE.pattern), False)
+
+    masks = {
+        'missing_email': pc.invert(has_email),
+        'invalid_email': pc.and_(has_email, pc.invert(email_ok)),
+    }
+
+    # Даты: пустые - дата по умолчанию, остальное разбирается по колонке целиком
+    raw_date = pc.utf8_trim_whitespace(pc.cast(table['date'], pa.string()))
+    has_date = pc.fill_null(pc.greater(pc.utf8_length(raw_date), 0), False)
+    # Различных дат в рассылке обычно немного: разбираются только уникальные значения
+    encoded = pc.dictionary_encode(raw_date).combine_chunks()
+    parsed = pc.take(_parse_dates_arrow(encoded.dictionary), encoded.indices)
+    date_ok = pc.is_valid(parsed)
+
+    if default_date is None:
+        masks['missing_date'] = pc.and_(email_ok, pc.invert(has_date))
+    else:
+        masks['missing_date'] = pc.and_(email_ok, pa.scalar(False))
+        parsed = pc.if_else(has_date, parsed, pa.scalar(default_date, type=pa.timestamp('us', tz='UTC')))
+
+    masks['invalid_date'] = pc.and_(pc.and_(email_ok, has_date), pc.invert(date_ok))
+    masks['past_date'] = pc.fill_null(pc.and_(email_ok, pc.less(parsed, now)), False)
+
+    counts = Counter()
+    samples = {}
+    values = {'missing_email': email, 'invalid_email': email, 'missing_date': email,
+              'invalid_date': raw_date, 'past_date': raw_date}
+    for category in ERROR_CATEGORIES:
+        mask = masks[category]
+        counts[category] = pc.sum(mask).as_py() or 0
+        indices = pc.indices_nonzero(mask).slice(0, max_errors)
+        samples[category] = [
+            {'line': index + 2, 'value': value}
+            for index, value in zip(indices.to_pylist(), pc.take(values[category], indices).to_pylist())
+        ]
+
+    # Повторы получателей (без учета регистра) среди строк с корректным email
+    valid_emails = pc.utf8_lower(pc.filter(email, email_ok))
+    value_counts = pc.value_counts(valid_emails)
+    repeated = pc.filter(value_counts, pc.greater(value_counts.field('counts'), 1))
+    counts['duplicate_email'] = (pc.sum(repeated.field('counts')).as_py() or 0) - len(repeated)
+    samples['duplicate_email'] = [
+        {'value': item['values'], 'count': item['counts']}
+        for item in repeated.slice(0, max_errors).to_pylist()
+    ]
+
+    return _summary(rows, counts, samples)
+
+
+def _parse_dates_arrow(raw_date):
+    """ISO 8601 по колонке: с часовым поясом -> UTC, наивные - в часовом поясе проекта"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # Приведение к виду 'YYYY-MM-DD HH:MM[:SS][+HHMM]' для strptime
+    normalized = pc.replace_substring_regex(raw_date, r'^(\d{4}-\d{2}-\d{2})T', r'\1 ')
+    normalized = pc.replace_substring_regex(normalized, r'(\d{2}:\d{2}:\d{2})\.\d+', r'\1')
+    normalized = pc.replace_substring_regex(normalized, r'Z$', '+0000')
+    normalized = pc.replace_substring_regex(normalized, r'([+-]\d{2}):(\d{2})$', r'\1\2')
+
+    def parse(formats):
+        results = [pc.strptime(normalized, format=f, unit='us', error_is_null=True) for f in formats]
+        return pc.coalesce(*results)
+
+    aware = parse(['%Y-%m-%d %H:%M:%S%z', '%Y-%m-%d %H:%M%z'])
+    naive = parse(['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'])
+    localized = pc.assume_timezone(
+        naive, settings.TIME_ZONE, ambiguous='earliest', nonexistent='earliest'
+    )
+    return pc.coalesce(pc.cast(aware, pa.timestamp('us', tz='UTC')), pc.cast(localized, pa.timestamp('us', tz='UTC')))
+
+
+def _validate_python(file, default_date, max_errors):
+    """Та же проверка без pyarrow: колонки читаются списками, проверки - по спискам"""
+    file.seek(0)
+    text = TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    emails, dates = [], []
+    try:
+        for row in csv.DictReader(text):
+            emails.append((row.get('email') or '').strip())
+            dates.append((row.get('date') or '').strip())
+    finally:
+        # Обертка не должна закрыть загруженный файл
+        text.detach()
+
+    now = timezone.now()
+    counts = Counter()
+    samples = {category: [] for category in ERROR_CATEGORIES}
+    valid_emails = Counter()
+
+    def fail(category, line, value):
+        counts[category] += 1
+        if len(samples[category]) < max_errors:
+            samples[category].append({'line': line, 'value': value})
+
+    match = EMAIL_RE.match
+    for line, (email, date) in enumerate(zip(emails, dates), 2):
+        if not email:
+            fail('missing_email', line, email)
+            continue
+        if not match(email):
+            fail('invalid_email', line, email)
+            continue
+        valid_emails[email.lower()] += 1
+
+        if not date and default_date is None:
+            fail('missing_date', line, email)
+            continue
+        try:
+            scheduled_date = parse_row_date(date, default_date)
+        except ValueError:
+            fail('invalid_date', line, date)
+            continue
+        if scheduled_date < now:
+            fail('past_date', line, date)
+
+    repeated = [(email, count) for email, count in valid_emails.items() if count > 1]
+    counts['duplicate_email'] = sum(count - 1 for _, count in repeated)
+    samples['duplicate_email'] = [{'value': email, 'count': count} for email, count in repeated[:max_errors]]
+
+    return _summary(len(emails), counts, samples)
@@ -0,0 +1,341 @@
+# core/imports.py
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from io import TextIOWrapper
+import csv
+import re
+import tempfile
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Строк в одной пачке: шифрование, bulk_create и транзакция на пачку
+IMPORT_CHUNK_SIZE = getattr(settings, 'CSV_IMPORT', {}).get('CHUNK_SIZE', 1000)
+
+# Сколько ошибок держать в памяти для показа пользователю (остальные - в отчете)
+ERROR_PREVIEW_SIZE = 5
+
+REPORT_FIELDS = ['line', 'email', 'error']
+
+# Проверка email при импорте и пробном прогоне (совместимо с RE2 для pyarrow)
+EMAIL_RE = re.compile(
+    r"^[A-Za-z0-9.!#$%&'*+/=?^_`{|}~-]+@"
+    r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+    r"(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?)+$"
+)
+
+
+class ImportResult:
+    """Итог импорта: счетчики, первые ошибки и CSV-отчет со всеми ошибками"""
+
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self._report = None
+        self._writer = None
+
+    @property
+    def processed(self):
+        return self.created + self.failed
+
+    def add_error(self, line, email, error):
+        self.failed += 1
+        if len(self.errors) < ERROR_PREVIEW_SIZE:
+            self.errors.append(f"Строка {line}: {error}")
+
+        if self._writer is None:
+            self._report = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode='w+', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._report)
+            self._writer.writerow(REPORT_FIELDS)
+        self._writer.writerow([line, email, error])
+
+    def save_report(self, name):
+        """Сохранение отчета об ошибках в хранилище (None, если ошибок нет)"""
+        if self._report is None:
+            return None
+        self._report.seek(0)
+        try:
+            return default_storage.save(name, File(self._report))
+        finally:
+            self._report.close()
+            self._report = self._writer = None
+
+
+def has_placeholders(text):
+    """Есть ли в тексте подстановки шаблона ({{ }} или {% %})"""
+    return '{{' in text or '{%' in text
+
+
+def get_report_name(user, report_id=None):
+    """Путь отчета об ошибках в хранилище (в каталоге пользователя)"""
+    return f"imports/reports/{user.pk}/{report_id or uuid.uuid4().hex}.csv"
+
+
+def build_renderer(template=None, common_message=''):
+    """
+    Функция row -> текст сообщения. Шаблон компилируется один раз на импорт.
+    Возвращает (render, static): static - текст одинаков для всех строк.
+    """
+    if template is not None:
+        if not has_placeholders(template.content):
+            message = template.content
+            return (lambda row: message), True
+
+        from .templating import get_compiled_template
+        return get_compiled_template(template).render, False
+
+    if not common_message:
+        return None, False
+
+    # Подстановка значений из CSV: текст разбирается один раз, строка собирается одним join
+    from .templating import PlaceholderMessage
+    message = PlaceholderMessage(common_message)
+    return message.render, message.is_static
+
+
+def parse_row_date(value, default):
+    """Дата отправки из CSV (ISO 8601 или YYYY-MM-DD), наивная - в текущем часовом поясе"""
+    if not value:
+        return default
+
+    value = value.strip()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"Неверная дата: {value}")
+        parsed = timezone.datetime.combine(date, timezone.datetime.min.time())
+
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def iter_csv_rows(file, encoding='utf-8-sig'):
+    """Потоковое чтение CSV: (номер строки, словарь значений)"""
+    file.seek(0)
+    reader = csv.DictReader(TextIOWrapper(file, encoding=encoding, newline=''))
+    # Строка 1 - заголовок
+    for line, row in enumerate(reader, 2):
+        yield line, row
+
+
+def import_capsules(file, user, template=None, common_message='', default_date=None,
+                    on_chunk=None, chunk_size=None):
+    """
+    Импорт капсул из CSV.
+    Строки читаются потоком, шаблон компилируется один раз, сообщения шифруются
+    пачками, капсулы вставляются через bulk_create с отдельной транзакцией на пачку,
+    поэтому память ограничена размером пачки, а долгих транзакций нет.
+    on_chunk(result) вызывается после каждой пачки (прогресс).
+    """
+    from .models import CampaignPayload
+    from .stats import bump_stats_version
+
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    result = ImportResult()
+    render, static = build_renderer(template, common_message)
+
+    # Сообщение без подстановок шифруется один раз и хранится общим для всех капсул
+    payload = None
+    if render is not None and static:
+        payload = CampaignPayload.for_message(user, render({}))
+
+    chunk = []
+    for line, row in iter_csv_rows(file):
+        chunk.append((line, row))
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, user, render, payload, default_date, result)
+            chunk = []
+            if on_chunk:
+                on_chunk(result)
+
+    if chunk:
+        _import_chunk(chunk, user, render, payload, default_date, result)
+        if on_chunk:
+            on_chunk(result)
+
+    if result.created:
+        bump_stats_version()
+
+    logger.info(f"Импорт CSV: создано {result.created}, ошибок {result.failed}")
+    return result
+
+
+def _import_chunk(chunk, user, render, payload, default_date, result):
+    """Проверка, шифрование и вставка одной пачки строк"""
+    from .encryption import key_manager
+    from .models import TimeCapsule
+
+    now = timezone.now()
+    capsules = []
+    messages = []
+
+    for line, row in chunk:
+        email = (row.get('email') or '').strip()
+        if not email:
+            result.add_error(line, email, 'Отсутствует email')
+            continue
+        if not EMAIL_RE.match(email):
+            result.add_error(line, email, 'Неверный email')
+            continue
+
+        if render is None:
+            result.add_error(line, email, 'Не указано сообщение')
+            continue
+
+        try:
+            scheduled_date = parse_row_date(row.get('date'), default_date)
+            if scheduled_date is None:
+                raise ValueError('Не указана дата отправки')
+            if scheduled_date < now:
+                raise ValueError('Дата отправки в прошлом')
+            message = None if payload is not None else render(row)
+        except Exception as e:
+            result.add_error(line, email, str(e))
+            continue
+
+        capsules.append(TimeCapsule(
+            recipient_email=email,
+            scheduled_date=scheduled_date,
+            created_by=user,
+            payload=payload
+        ))
+        messages.append(message)
+
+    if payload is None and capsules:
+        encrypted_messages = key_manager.encrypt_many(messages)
+        encrypted_previews = key_manager.encrypt_many([TimeCapsule.make_preview(m) for m in messages])
+        for capsule, encrypted_message, encrypted_preview in zip(capsules, encrypted_messages, encrypted_previews):
+            capsule.encrypted_message = encrypted_message
+            capsule.encrypted_preview = encrypted_preview
+
+    if capsules:
+        with transaction.atomic():
+            TimeCapsule.objects.bulk_create(capsules, batch_size=len(capsules))
+        result.created += len(capsules)
+
+
+def count_rows(file):
+    """Быстрая оценка числа строк данных (переводы строк минус заголовок)"""
+    file.seek(0)
+    lines = 0
+    last = b''
+    while True:
+        block = file.read(1024 * 1024)
+        if not block:
+            break
+        lines += block.count(b'\n')
+        last = block
+    if last and not last.endswith(b'\n'):
+        lines += 1
+    file.seek(0)
+    return max(lines - 1, 0)
+
+
+def create_import_job(user, csv_file, template=None, common_message='', default_date=None):
+    """Сохранение загруженного CSV и постановка импорта в очередь после коммита"""
+    from .models import ImportJob
+
+    job = ImportJob(
+        created_by=user,
+        template=template,
+        common_message=common_message or '',
+        default_date=default_date,
+    )
+    job.csv_file.save(csv_file.name, csv_file, save=False)
+    job.save()
+
+    transaction.on_commit(lambda: enqueue_import_job(job.pk))
+    return job
+
+
+def enqueue_import_job(job_id):
+    """
+    Постановка импорта в очередь Celery. Импорт никогда не выполняется в веб-воркере:
+    если брокер недоступен, задание помечается как failed с текстом ошибки.
+    """
+    from .models import ImportJob
+
+    try:
+        from chronomail.celery import run_import_job_task
+        run_import_job_task.delay(str(job_id))
+    except Exception as e:
+        logger.error(f"Не удалось поставить импорт {job_id} в очередь: {e}")
+        ImportJob.objects.filter(pk=job_id, status='pending').update(
+            status='failed',
+            error=f"Очередь задач недоступна: {e}",
+            finished_at=timezone.now(),
+        )
+
+
+def run_import_job(job_id):
+    """Обработка задания импорта (выполняется в воркере)"""
+    from .models import ImportJob
+
+    # Переход pending -> running атомарный: повторная доставка задачи ничего не сделает
+    started = ImportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    )
+    if not started:
+        return None
+
+    job = ImportJob.objects.select_related('created_by', 'template').get(pk=job_id)
+    progress = ImportJob.objects.filter(pk=job_id)
+
+    try:
+        with job.csv_file.open('rb') as f:
+            progress.update(rows_total=count_rows(f))
+            result = import_capsules(
+                f,
+                job.created_by,
+                template=job.template,
+                common_message=job.common_message,
+                default_date=job.default_date,
+                on_chunk=lambda result: progress.update(
+                    rows_done=result.created, rows_failed=result.failed
+                ),
+            )
+    except Exception as e:
+        logger.exception(f"Ошибка импорта {job_id}")
+        progress.update(status='failed', error=str(e), finished_at=timezone.now())
+        return None
+
+    job.report = result.save_report(get_report_name(job.created_by, job.pk.hex)) or ''
+    job.rows_done = result.created
+    job.rows_failed = result.failed
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['report', 'rows_done', 'rows_failed', 'status', 'finished_at'])
+    return result.created
+
+
+# Поля прогресса: отдаются одним SELECT по первичному ключу, без создания модели
+PROGRESS_FIELDS = ('id', 'status', 'rows_total', 'rows_done', 'rows_failed', 'error', 'report')
+
+
+def get_job_progress(user, job_id):
+    """Прогресс задания пользователя (None, если не найдено или id - не UUID)"""
+    from .models import ImportJob
+
+    try:
+        job_id = uuid.UUID(str(job_id))
+    except ValueError:
+        return None
+
+    progress = ImportJob.objects.filter(pk=job_id, created_by=user).values(*PROGRESS_FIELDS).first()
+    if progress is None:
+        return None
+
+    progress['id'] = str(progress['id'])
+    progress['finished'] = progress['status'] in ('done', 'failed')
+    report = progress.pop('report')
+    progress['report_url'] = reverse('bulk_import_report', args=[progress['id'].replace('-', '')]) if report else None
+    return progress
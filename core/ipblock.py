@@ -0,0 +1,106 @@
+# core/ipblock.py
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BlockedIPStore:
+    """
+    Временные блокировки IP в общем кэше с локальным TTL-кэшем решений процесса.
+    Проверка незаблокированного IP обычно не обращается к кэшу: решение хранится
+    в процессе, а о новых блокировках и разблокировках процессы узнают по ключу
+    версии, который читается не чаще раза в VERSION_CHECK_INTERVAL секунд.
+    """
+
+    key_prefix = 'blocked_ip_'
+    version_key = 'blocked_ip_version'
+
+    def __init__(self):
+        config = getattr(settings, 'IP_BLOCK', {})
+        self.duration = config.get('DURATION', 300)
+        self.negative_ttl = config.get('NEGATIVE_TTL', 30)
+        self.positive_ttl = config.get('POSITIVE_TTL', 5)
+        self.version_check_interval = config.get('VERSION_CHECK_INTERVAL', 2)
+        self.max_size = config.get('LOCAL_MAX_SIZE', 10000)
+
+        self._decisions = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = 0
+
+    def make_key(self, ip):
+        return f"{self.key_prefix}{ip}"
+
+    def is_blocked(self, ip):
+        self._check_version()
+
+        now = time.monotonic()
+        with self._lock:
+            decision = self._decisions.get(ip)
+            if decision is not None and decision[1] > now:
+                self._decisions.move_to_end(ip)
+                return decision[0]
+
+        blocked = cache.get(self.make_key(ip)) is not None
+        self._remember(ip, blocked, self.positive_ttl if blocked else self.negative_ttl)
+        return blocked
+
+    def block(self, ip, timeout=None):
+        """Блокировка IP для всех процессов (по умолчанию на DURATION секунд)"""
+        timeout = timeout or self.duration
+        cache.set(self.make_key(ip), True, timeout)
+        self._bump_version()
+        self._remember(ip, True, timeout)
+
+    def unblock(self, ip):
+        cache.delete(self.make_key(ip))
+        self._bump_version()
+        self._remember(ip, False, self.negative_ttl)
+
+    def clear_local(self):
+        with self._lock:
+            self._decisions.clear()
+
+    def _remember(self, ip, blocked, ttl):
+        with self._lock:
+            self._decisions[ip] = (blocked, time.monotonic() + ttl)
+            self._decisions.move_to_end(ip)
+            while len(self._decisions) > self.max_size:
+                self._decisions.popitem(last=False)
+
+    def _bump_version(self):
+        try:
+            version = cache.incr(self.version_key)
+        except ValueError:
+            # Ключ версии пропал (вытеснен, кэш перезапущен): новое значение уникально,
+            # чтобы не совпасть с версией, запомненной другими процессами
+            version = time.time_ns()
+            cache.set(self.version_key, version, None)
+        with self._lock:
+            # Версия ушла дальше, чем на свое изменение: были и чужие
+            if self._version is None or version != self._version + 1:
+                self._decisions.clear()
+            self._version = version
+            self._version_checked_at = time.monotonic()
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_interval:
+            return
+
+        version = cache.get(self.version_key)
+        with self._lock:
+            self._version_checked_at = now
+            if version != self._version:
+                # Блокировки изменились в другом процессе: локальные решения устарели
+                self._version = version
+                self._decisions.clear()
+
+
+# Общее хранилище блокировок для IPFilterMiddleware
+ip_blocks = BlockedIPStore()
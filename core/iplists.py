@@ -0,0 +1,72 @@
+# core/iplists.py
+from bisect import bisect_right
+import ipaddress
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IPNetworkSet:
+    """
+    Набор IP-сетей (IPv4 и IPv6), разобранный один раз.
+    Сети хранятся как отсортированные непересекающиеся интервалы целых адресов,
+    поиск - бинарный (O(log n)), поэтому списки на 100k+ CIDR не замедляют запрос.
+    """
+
+    def __init__(self, entries=(), name='IP'):
+        entries = list(entries)
+        self.name = name
+        self._intervals = {4: ([], []), 6: ([], [])}
+        # Настроенный, но полностью некорректный белый список по-прежнему запрещает все
+        self.configured = bool(entries)
+        self.size = 0
+
+        ranges = {4: [], 6: []}
+        for entry in entries:
+            entry = (entry or '').strip()
+            if not entry:
+                logger.warning(f"Пустой IP-адрес в {name}")
+                continue
+            try:
+                network = ipaddress.ip_network(entry)
+            except ValueError as e:
+                logger.warning(f"Неверный формат IP-сети в {name}: '{entry}', ошибка: {e}")
+                continue
+            ranges[network.version].append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+            self.size += 1
+
+        for version, items in ranges.items():
+            starts, ends = self._intervals[version]
+            # Слияние пересекающихся и смежных сетей
+            for start, end in sorted(items):
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+
+    def __bool__(self):
+        return self.configured
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, ip):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+
+        if address.version == 6 and address.ipv4_mapped:
+            # ::ffff:a.b.c.d проверяется и как IPv4
+            if self._lookup(address.ipv4_mapped):
+                return True
+        return self._lookup(address)
+
+    def _lookup(self, address):
+        starts, ends = self._intervals[address.version]
+        value = int(address)
+        index = bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
@@ -0,0 +1,366 @@
+# core/management/commands/benchmark.py
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    """
+    Микробенчмарки горячих путей.
+    Данные создаются внутри транзакции, которая откатывается в конце.
+    """
+    help = 'Замер производительности (данные для замеров откатываются)'
+
+    benchmarks = {
+        'list_endpoint': 'bench_list_endpoint',
+        'list_queries': 'bench_list_queries',
+        'serialization': 'bench_serialization',
+        'bulk_create': 'bench_bulk_create',
+        'csv_validation': 'bench_csv_validation',
+        'template_render': 'bench_template_render',
+        'message_substitution': 'bench_message_substitution',
+        'token_auth': 'bench_token_auth',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets', nargs='*',
+            help=f"Какие замеры запустить: {', '.join(self.benchmarks)} (по умолчанию все)"
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Количество повторов каждого замера')
+
+    def handle(self, *args, **options):
+        targets = options['targets'] or list(self.benchmarks)
+        unknown = set(targets) - set(self.benchmarks)
+        if unknown:
+            raise CommandError(f"Неизвестные замеры: {', '.join(sorted(unknown))}")
+
+        self.repeat = options['repeat']
+
+        # Запросы строятся через APIRequestFactory с хостом testserver
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            self.user = get_user_model().objects.create(username=f"benchmark_{int(time.time())}")
+            for target in targets:
+                self.stdout.write(self.style.MIGRATE_HEADING(target))
+                getattr(self, self.benchmarks[target])()
+            transaction.set_rollback(True)
+
+    def measure(self, label, func, repeat=None):
+        """Медианное время выполнения func в миллисекундах"""
+        timings = []
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        median = statistics.median(timings)
+        self.stdout.write(f"  {label:<50} {median:>10.3f} ms")
+        return median
+
+    def create_capsules(self, count, message='Сообщение для замера производительности ' * 5):
+        """Создание капсул с настоящим шифрованием"""
+        from core.models import TimeCapsule
+
+        scheduled_date = timezone.now() + timezone.timedelta(days=30)
+        capsules = []
+        for i in range(count):
+            capsule = TimeCapsule(
+                recipient_email=f"bench{i}@example.com",
+                scheduled_date=scheduled_date,
+                created_by=self.user
+            )
+            capsule.encrypt_message(message)
+            capsules.append(capsule)
+        return TimeCapsule.objects.bulk_create(capsules)
+
+    def bench_list_endpoint(self):
+        """Латентность списка капсул: заглушка превью против расшифровки каждой строки"""
+        import logging
+        from rest_framework.mixins import ListModelMixin
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from core.api.serializers import TimeCapsuleSerializer
+        from core.api.views import TimeCapsuleViewSet
+
+        class DecryptingSerializer(TimeCapsuleSerializer):
+            def get_message_preview(self, obj):
+                return obj.make_preview(obj.decrypt_message())
+
+        class DecryptingViewSet(TimeCapsuleViewSet):
+            # Прежний путь списка: ModelSerializer вместо .values()
+            list = ListModelMixin.list
+
+            def get_serializer_class(self):
+                return DecryptingSerializer
+
+        # Логи шифрования не должны искажать замер
+        logging.getLogger('core.encryption').setLevel(logging.WARNING)
+        self.create_capsules(100)
+        factory = APIRequestFactory()
+
+        def call(viewset, page_size):
+            request = factory.get('/api/capsules/', {'page_size': page_size})
+            force_authenticate(request, user=self.user)
+            viewset.as_view({'get': 'list'})(request).render()
+
+        for page_size in (20, 100):
+            legacy = self.measure(
+                f"расшифровка каждой строки, {page_size} на странице",
+                lambda: call(DecryptingViewSet, page_size)
+            )
+            current = self.measure(
+                f"заглушка превью, {page_size} на странице",
+                lambda: call(TimeCapsuleViewSet, page_size)
+            )
+            self.stdout.write(f"  ускорение: x{legacy / current:.1f}")
+
+    def bench_list_queries(self):
+        """
+        Количество SQL-запросов списочных эндпоинтов не должно зависеть от размера страницы.
+        При расхождении команда завершается ошибкой (N+1 запросов).
+        """
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from core.api.views import AttachmentViewSet, MessageTemplateViewSet, TimeCapsuleViewSet
+        from core.models import CapsuleAttachment, MessageTemplate
+
+        capsules = self.create_capsules(100)
+        CapsuleAttachment.objects.bulk_create([
+            CapsuleAttachment(
+                capsule=capsule, file=f"attachments/bench_{capsule.pk}_{i}.txt",
+                file_name=f"bench_{i}.txt", file_size=1, file_type='text/plain'
+            )
+            for capsule in capsules for i in range(2)
+        ])
+        MessageTemplate.objects.bulk_create([
+            MessageTemplate(name=f"bench {i}", content='{{name}}', created_by=self.user)
+            for i in range(100)
+        ])
+
+        factory = APIRequestFactory()
+        failed = []
+
+        for viewset in (TimeCapsuleViewSet, AttachmentViewSet, MessageTemplateViewSet):
+            counts = {}
+            for page_size in (5, 20, 100):
+                pagination_class = type('BenchPagination', (viewset.pagination_class,), {'page_size': page_size})
+                view = type(viewset.__name__, (viewset,), {'pagination_class': pagination_class})
+
+                request = factory.get('/')
+                force_authenticate(request, user=self.user)
+                with CaptureQueriesContext(connection) as queries:
+                    response = view.as_view({'get': 'list'})(request)
+                    response.render()
+                counts[page_size] = len(queries)
+
+            constant = len(set(counts.values())) == 1
+            line = f"  {viewset.__name__:<30} " + ', '.join(f"{size}: {n}" for size, n in counts.items())
+            self.stdout.write(line if constant else self.style.ERROR(f"{line}  N+1"))
+            if not constant:
+                failed.append(viewset.__name__)
+
+        if failed:
+            raise CommandError(f"Число запросов зависит от размера страницы: {', '.join(failed)}")
+
+    def bench_serialization(self):
+        """Сериализация списков: ModelSerializer + JSONRenderer против .values() + orjson"""
+        from rest_framework.renderers import JSONRenderer
+        from core.api.renderers import ORJSONRenderer
+        from core.api.serializers import (
+            MessageTemplateSerializer, MessageTemplateValuesSerializer,
+            TimeCapsuleSerializer, TimeCapsuleValuesSerializer
+        )
+        from core.models import MessageTemplate, TimeCapsule
+
+        # Шифруем один раз: замеряется сериализация, а не шифрование
+        sample = self.create_capsules(1)[0]
+        scheduled_date = timezone.now() + timezone.timedelta(days=30)
+        TimeCapsule.objects.bulk_create([
+            TimeCapsule(
+                recipient_email=f"bench{i}@example.com",
+                scheduled_date=scheduled_date,
+                encrypted_message=sample.encrypted_message,
+                encrypted_preview=sample.encrypted_preview,
+                created_by=self.user
+            )
+            for i in range(9999)
+        ], batch_size=1000)
+        MessageTemplate.objects.bulk_create([
+            MessageTemplate(name=f"bench {i}", content='Здравствуйте, {{name}}!', created_by=self.user)
+            for i in range(10000)
+        ], batch_size=1000)
+
+        cases = [
+            ('капсулы', TimeCapsule.objects.filter(created_by=self.user).order_by('-created_at', '-id'),
+             ('attachments',), TimeCapsuleSerializer, TimeCapsuleValuesSerializer),
+            ('шаблоны', MessageTemplate.objects.filter(created_by=self.user).order_by('-created_at', '-id'),
+             (), MessageTemplateSerializer, MessageTemplateValuesSerializer),
+        ]
+        legacy_renderer, fast_renderer = JSONRenderer(), ORJSONRenderer()
+        repeat = max(1, self.repeat // 4)
+
+        for name, queryset, prefetch, serializer_class, values_serializer_class in cases:
+            for rows in (1000, 10000):
+                def legacy():
+                    objects = queryset.prefetch_related(*prefetch)[:rows]
+                    legacy_renderer.render(serializer_class(objects, many=True).data)
+
+                def fast():
+                    values_serializer = values_serializer_class()
+                    page = list(queryset.values(*values_serializer.columns)[:rows])
+                    fast_renderer.render(values_serializer.to_representation(page))
+
+                legacy_ms = self.measure(f"{name}, {rows} строк: ModelSerializer", legacy, repeat)
+                fast_ms = self.measure(f"{name}, {rows} строк: values() + orjson", fast, repeat)
+                self.stdout.write(f"  ускорение: x{legacy_ms / fast_ms:.1f}")
+
+    def bench_bulk_create(self):
+        """Массовое создание капсул: поштучные create() против bulk-эндпоинта"""
+        import logging
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from core.api.serializers import CreateCapsuleSerializer
+        from core.api.views import BulkCapsuleView
+
+        logging.getLogger('core').setLevel(logging.WARNING)
+        scheduled_date = (timezone.now() + timezone.timedelta(days=30)).isoformat()
+        factory = APIRequestFactory()
+
+        def make_items(count):
+            return [
+                {
+                    'recipient_email': f"bulk{i}@example.com",
+                    'scheduled_date': scheduled_date,
+                    'message': f"Сообщение {i} для массового создания",
+                }
+                for i in range(count)
+            ]
+
+        def per_item(items):
+            for item in items:
+                serializer = CreateCapsuleSerializer(data=item)
+                if serializer.is_valid():
+                    serializer.save(created_by=self.user)
+
+        def bulk(items):
+            request = factory.post('/api/capsules/bulk/', {'capsules': items}, format='json')
+            force_authenticate(request, user=self.user)
+            response = BulkCapsuleView.as_view()(request)
+            if response.status_code != 201:
+                raise CommandError(f"Bulk-эндпоинт вернул {response.status_code}")
+
+        items = make_items(1000)
+        legacy = self.measure('1000 капсул поштучно', lambda: per_item(items), repeat=1)
+        current = self.measure('1000 капсул через bulk', lambda: bulk(items), repeat=3)
+        self.stdout.write(f"  ускорение: x{legacy / current:.1f}")
+
+        items = make_items(10000)
+        self.measure('10000 капсул через bulk', lambda: bulk(items), repeat=1)
+
+    def bench_csv_validation(self):
+        """Пробная проверка CSV на миллион строк: по колонкам (pyarrow) и построчно"""
+        from io import BytesIO
+        from core import import_validation
+
+        dates = [
+            (timezone.now() + timezone.timedelta(days=30 + i)).strftime('%Y-%m-%dT%H:%M:%SZ')
+            for i in range(28)
+        ]
+        lines = ['email,date,name']
+        lines.extend(f"user{i}@example.com,{dates[i % 28]},Имя {i}" for i in range(1_000_000))
+        data = BytesIO(('\n'.join(lines) + '\n').encode())
+
+        legacy = self.measure(
+            '1M строк, списками в Python',
+            lambda: import_validation._validate_python(data, None, 10), repeat=1
+        )
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.stdout.write('  pyarrow не установлен, векторная проверка пропущена')
+            return
+
+        current = self.measure(
+            '1M строк, по колонкам (pyarrow)',
+            lambda: import_validation._validate_arrow(data, None, 10), repeat=3
+        )
+        self.stdout.write(f"  ускорение: x{legacy / current:.1f}")
+
+    def bench_template_render(self):
+        """Рендеринг MessageTemplate на строку CSV: компиляция на каждый вызов против кэша"""
+        from django.template import Context, Template
+        from core.models import MessageTemplate
+
+        rows = [{'name': f"Имя {i}", 'city': 'Москва', 'date': '2030-01-01'} for i in range(10000)]
+        simple = MessageTemplate.objects.create(
+            name='bench simple', created_by=self.user,
+            content='Здравствуйте, {{ name }}! Встречаемся в городе {{city}} ' * 5 + '{{date}}.'
+        )
+        filtered = MessageTemplate.objects.create(
+            name='bench filters', created_by=self.user,
+            content='Здравствуйте, {{ name|upper }}! {% if city %}Город: {{ city }}{% endif %}'
+        )
+
+        for label, template in (('{{имя}}', simple), ('фильтры и теги', filtered)):
+            legacy = self.measure(
+                f"10000 строк, {label}, Template() на вызов",
+                lambda: [Template(template.content).render(Context(row)) for row in rows], repeat=3
+            )
+            current = self.measure(
+                f"10000 строк, {label}, MessageTemplate.render",
+                lambda: [template.render(row) for row in rows], repeat=3
+            )
+            self.stdout.write(f"  ускорение: x{legacy / current:.1f} ({current * 1000 / len(rows):.1f} мкс на строку)")
+
+    def bench_message_substitution(self):
+        """Общее сообщение с {{ключ}}: replace по каждой колонке против разобранного сообщения"""
+        from core.imports import build_renderer
+
+        def legacy_render(message, row):
+            for key, value in row.items():
+                message = message.replace(f'{{{{{key}}}}}', value or '')
+            return message
+
+        for columns, paragraphs in ((10, 5), (60, 5), (60, 100)):
+            keys = [f"column_{i}" for i in range(columns)]
+            rows = [{key: f"значение {i}" for key in keys} for i in range(5000)]
+            message = ' '.join(
+                f"Абзац {i} текста рассылки с подстановкой {{{{{keys[i % columns]}}}}}." for i in range(paragraphs)
+            )
+            render, _ = build_renderer(common_message=message)
+
+            label = f"5000 строк, {columns} колонок, {len(message)} симв."
+            legacy = self.measure(f"{label}, replace", lambda: [legacy_render(message, row) for row in rows], repeat=3)
+            current = self.measure(f"{label}, join", lambda: [render(row) for row in rows], repeat=3)
+            self.stdout.write(f"  ускорение: x{legacy / current:.1f}")
+
+    def bench_token_auth(self):
+        """Аутентификация по токену на запрос: TokenAuthentication против кэша"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.authentication import TokenAuthentication
+        from rest_framework.authtoken.models import Token
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from core.api.authentication import CachedTokenAuthentication, invalidate_token
+
+        token = Token.objects.create(user=self.user)
+        request = Request(APIRequestFactory().get('/api/capsules/', HTTP_AUTHORIZATION=f"Token {token.key}"))
+
+        def authenticate(backend):
+            for _ in range(1000):
+                backend.authenticate(request)
+
+        invalidate_token(token.key)
+        for label, backend in (('TokenAuthentication', TokenAuthentication()),
+                               ('CachedTokenAuthentication', CachedTokenAuthentication())):
+            with CaptureQueriesContext(connection) as queries:
+                backend.authenticate(request)
+                authenticate(backend)
+            median = self.measure(f"1000 запросов, {label}", lambda: authenticate(backend), repeat=5)
+            self.stdout.write(
+                f"  {median:.3f} мкс на запрос, SQL-запросов на 1001 запрос: {len(queries)}"
+            )
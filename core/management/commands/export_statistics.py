@@ -0,0 +1,46 @@
+# core/management/commands/export_statistics.py
+import sys
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from core.export import EXPORT_DATASETS, stream_export, write_parquet
+
+
+class Command(BaseCommand):
+    """Потоковый экспорт статистики в CSV, NDJSON или Parquet"""
+    help = 'Экспорт агрегатов статистики или метаданных капсул (без текста сообщений)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=list(EXPORT_DATASETS), default='rollups')
+        parser.add_argument('--format', choices=['csv', 'ndjson', 'parquet'], default='csv')
+        parser.add_argument('--output', '-o', help='Файл для записи (по умолчанию stdout)')
+        parser.add_argument('--user', help='Экспортировать только капсулы этого пользователя')
+
+    def handle(self, *args, **options):
+        dataset = options['dataset']
+        export_format = options['format']
+        output = options['output']
+
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Пользователь {options['user']} не найден")
+
+        if export_format == 'parquet':
+            if not output:
+                raise CommandError('Для формата parquet укажите --output')
+            try:
+                written = write_parquet(dataset, output, user=user)
+            except ImportError as e:
+                raise CommandError(str(e))
+            self.stderr.write(self.style.SUCCESS(f'Экспортировано строк: {written}'))
+            return
+
+        stream = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+        try:
+            for chunk in stream_export(dataset, export_format, user=user):
+                stream.write(chunk)
+        finally:
+            if output:
+                stream.close()
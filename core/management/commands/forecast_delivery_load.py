@@ -0,0 +1,38 @@
+# core/management/commands/forecast_delivery_load.py
+from django.core.management.base import BaseCommand
+from core.stats import StatisticsCollector, FORECAST_GRANULARITIES
+
+
+class Command(BaseCommand):
+    """Прогноз нагрузки доставки по расписанию ожидающих капсул"""
+    help = 'Гистограмма ожидающих капсул на ближайшие дни с отметкой пиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--granularity', choices=FORECAST_GRANULARITIES, default='hour')
+        parser.add_argument('--spikes-only', action='store_true', help='Показать только пики')
+
+    def handle(self, *args, **options):
+        forecast = StatisticsCollector().get_delivery_forecast(
+            days=options['days'],
+            granularity=options['granularity']
+        )
+
+        self.stdout.write(
+            f"Период: {forecast['start']} - {forecast['end']}, "
+            f"ожидает капсул: {forecast['total_pending']}, медиана: {forecast['baseline']}"
+        )
+
+        buckets = forecast['spikes'] if options['spikes_only'] else forecast['buckets']
+        for bucket in buckets:
+            line = f"{bucket['time']}  {bucket['count']:>8}"
+            if bucket['spike']:
+                self.stdout.write(self.style.WARNING(f"{line}  ПИК"))
+            else:
+                self.stdout.write(line)
+
+        if forecast['spikes']:
+            self.stdout.write(self.style.WARNING(
+                f"Обнаружено пиков: {len(forecast['spikes'])}. "
+                f"Увеличьте пул Celery-воркеров заранее."
+            ))
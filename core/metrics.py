@@ -0,0 +1,150 @@
+# core/metrics.py
+from django.core.cache import cache
+from django.conf import settings
+from django.utils import timezone
+import threading
+import atexit
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsStore:
+    """
+    Хранилище метрик в реальном времени поверх кэша.
+    TTL задается нативно в кэше, чтение не затрагивает БД.
+    Таблица RealTimeMetrics используется только как отложенная (write-behind)
+    копия для надежности: изменения копятся в процессе и сбрасываются пачкой.
+    """
+
+    key_prefix = 'rtm'
+
+    def __init__(self):
+        config = getattr(settings, 'METRICS_STORE', {})
+        self.persist = config.get('PERSIST', True)
+        self.flush_interval = config.get('FLUSH_INTERVAL', 30)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._timer = None
+        self._timer_pid = None
+
+    def make_key(self, key):
+        return f"{self.key_prefix}:{key}"
+
+    def set(self, key, value, ttl=None):
+        """Запись метрики в кэш и постановка в очередь на сохранение в БД"""
+        cache.set(self.make_key(key), value, ttl)
+
+        if self.persist:
+            expires_at = timezone.now() + timezone.timedelta(seconds=ttl) if ttl else None
+            with self._lock:
+                self._pending[key] = (value, expires_at)
+
+            self._ensure_timer()
+
+        return value
+
+    def _ensure_timer(self):
+        """
+        Фоновый сброс буфера раз в flush_interval в том процессе, где он копится
+        (веб-воркер), а не при следующем set(). Таймер заводится заново после fork.
+        """
+        pid = os.getpid()
+        if self._timer_pid == pid and self._timer is not None and self._timer.is_alive():
+            return
+
+        with self._lock:
+            if self._timer_pid == pid and self._timer is not None and self._timer.is_alive():
+                return
+            self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+            self._timer.daemon = True
+            self._timer_pid = pid
+            self._timer.start()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._timer = None
+                has_pending = bool(self._pending)
+            # Пока есть несохраненные метрики, таймер перезаводится
+            if has_pending:
+                self._ensure_timer()
+
+    def get(self, key, default=None):
+        """Чтение метрики: кэш, при промахе - только SELECT из БД (без удаления)"""
+        value = cache.get(self.make_key(key))
+        if value is not None:
+            return value
+
+        if not self.persist:
+            return default
+
+        from .models import RealTimeMetrics
+
+        now = timezone.now()
+        row = RealTimeMetrics.objects.filter(metric_key=key).values(
+            'metric_value', 'expires_at'
+        ).first()
+
+        if not row or (row['expires_at'] and row['expires_at'] <= now):
+            return default
+
+        # Прогрев кэша с оставшимся временем жизни
+        ttl = int((row['expires_at'] - now).total_seconds()) if row['expires_at'] else None
+        cache.set(self.make_key(key), row['metric_value'], ttl)
+        return row['metric_value']
+
+    def flush(self):
+        """Сброс накопленных метрик в RealTimeMetrics одним upsert-запросом"""
+        from .models import RealTimeMetrics
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+
+        if not pending:
+            return 0
+
+        objects = [
+            RealTimeMetrics(metric_key=key, metric_value=value, expires_at=expires_at)
+            for key, (value, expires_at) in pending.items()
+        ]
+
+        try:
+            RealTimeMetrics.objects.bulk_create(
+                objects,
+                update_conflicts=True,
+                unique_fields=['metric_key'],
+                update_fields=['metric_value', 'expires_at', 'updated_at'],
+            )
+        except Exception as e:
+            logger.error(f"Ошибка сохранения метрик в БД: {e}")
+            # Возвращаем в очередь, если не появились более свежие значения
+            with self._lock:
+                for key, item in pending.items():
+                    self._pending.setdefault(key, item)
+            return 0
+
+        return len(objects)
+
+    def purge_expired(self):
+        """Массовое удаление истекших строк RealTimeMetrics"""
+        from .models import RealTimeMetrics
+
+        deleted, _ = RealTimeMetrics.objects.filter(
+            expires_at__lt=timezone.now()
+        ).delete()
+
+        if deleted:
+            logger.info(f"Удалено истекших метрик: {deleted}")
+        return deleted
+
+
+# Глобальный экземпляр хранилища метрик
+metrics_store = MetricsStore()
+atexit.register(metrics_store.flush)
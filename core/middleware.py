@@ -1,10 +1,13 @@
-import ipaddress
-from django.utils import timezone
-from django.core.cache import cache
+from django.core.signals import setting_changed
 from django.http import HttpResponseForbidden
 from django.conf import settings
 import logging
 
+from .ipblock import ip_blocks
+from .iplists import IPNetworkSet
+from .ratelimit import rate_limiter
+from .suspicious import suspicious_log
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,12 +16,22 @@ class IPFilterMiddleware:
 
     def __init__(self, get_response):
         self.get_response = get_response
-        self.blocked_ips = getattr(settings, 'BLOCKED_IPS', [])
-        self.allowed_ips = getattr(settings, 'ALLOWED_IPS', [])
+        self.load_ip_lists()
         self.rate_limit = getattr(settings, 'RATE_LIMIT', {
             'requests': 100,  # Максимум запросов
             'period': 60,  # За период в секундах
         })
+        setting_changed.connect(self.reload_settings)
+
+    def load_ip_lists(self):
+        """Разбор ALLOWED_IPS и BLOCKED_IPS один раз (а не на каждый запрос)"""
+        self.allowed_ips = IPNetworkSet(getattr(settings, 'ALLOWED_IPS', []), 'ALLOWED_IPS')
+        self.blocked_ips = IPNetworkSet(getattr(settings, 'BLOCKED_IPS', []), 'BLOCKED_IPS')
+
+    def reload_settings(self, setting, **kwargs):
+        """Пересборка списков при изменении настроек (override_settings, перезагрузка)"""
+        if setting in ('ALLOWED_IPS', 'BLOCKED_IPS'):
+            self.load_ip_lists()
 
     def __call__(self, request):
         client_ip = self.get_client_ip(request)
@@ -55,7 +68,7 @@ class IPFilterMiddleware:
 
         # Логирование подозрительных запросов
         if response.status_code == 403 or response.status_code == 400:
-            self.log_suspicious_request(client_ip, request)
+            self.log_suspicious_request(client_ip, request, response.status_code)
 
         return response
 
@@ -69,78 +82,30 @@ class IPFilterMiddleware:
         return ip
 
     def is_ip_blocked(self, ip):
-        """Проверка, заблокирован ли IP"""
-        cache_key = f"blocked_ip_{ip}"
-        return cache.get(cache_key) is not None
+        """Проверка, заблокирован ли IP (решение кэшируется в процессе)"""
+        return ip_blocks.is_blocked(ip)
 
     def is_ip_allowed(self, ip):
         """Проверка IP в белом списке"""
-        for allowed_ip in self.allowed_ips:
-            # Пропускаем пустые строки
-            if not allowed_ip or not allowed_ip.strip():
-                logger.warning(f"Пустой IP-адрес в ALLOWED_IPS: '{allowed_ip}'")
-                continue
-            
-            try:
-                if ipaddress.ip_address(ip) in ipaddress.ip_network(allowed_ip):
-                    return True
-            except ValueError as e:
-                logger.warning(f"Неверный формат IP-сети в ALLOWED_IPS: '{allowed_ip}', ошибка: {e}")
-                continue
-        return False
+        return ip in self.allowed_ips
 
     def is_ip_in_blacklist(self, ip):
         """Проверка IP в черном списке"""
-        for blocked_ip in self.blocked_ips:
-            # Пропускаем пустые строки
-            if not blocked_ip or not blocked_ip.strip():
-                logger.warning(f"Пустой IP-адрес в BLOCKED_IPS: '{blocked_ip}'")
-                continue
-            
-            try:
-                if ipaddress.ip_address(ip) in ipaddress.ip_network(blocked_ip):
-                    return True
-            except ValueError as e:
-                logger.warning(f"Неверный формат IP-сети в BLOCKED_IPS: '{blocked_ip}', ошибка: {e}")
-                continue
-        return False
+        return ip in self.blocked_ips
 
     def check_rate_limit(self, ip, path):
-        """Проверка ограничения скорости запросов"""
-        cache_key = f"rate_limit_{ip}_{path}"
-        requests = cache.get(cache_key, [])
+        """Проверка ограничения скорости запросов (атомарный счетчик окна)"""
+        result = rate_limiter.hit(
+            f"ip:{ip}:{path}", self.rate_limit['requests'], self.rate_limit['period']
+        )
 
-        # Удаление старых записей
-        now = timezone.now()
-        requests = [req_time for req_time in requests
-                    if (now - req_time).seconds < self.rate_limit['period']]
-
-        # Проверка лимита
-        if len(requests) >= self.rate_limit['requests']:
+        if not result.allowed:
             # Блокировка IP на 5 минут
-            cache.set(f"blocked_ip_{ip}", True, 300)
+            ip_blocks.block(ip, 300)
             return False
 
-        # Добавление текущего запроса
-        requests.append(now)
-        cache.set(cache_key, requests, self.rate_limit['period'])
-
         return True
 
-    def log_suspicious_request(self, ip, request):
-        """Логирование подозрительных запросов"""
-        log_entry = {
-            'ip': ip,
-            'path': request.path,
-            'method': request.method,
-            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-            'timestamp': timezone.now().isoformat(),
-            'params': dict(request.GET),
-            'data': dict(request.POST) if request.method == 'POST' else {}
-        }
-
-        # Сохранение в кэше для анализа
-        suspicious_key = f"suspicious_{ip}_{int(timezone.now().timestamp())}"
-        cache.set(suspicious_key, log_entry, 3600)  # Хранение 1 час
-
-        logger.warning(f"Подозрительный запрос от {ip}: {request.path}")
+    def log_suspicious_request(self, ip, request, status_code=None):
+        """Логирование подозрительных запросов (агрегируется в процессе, сбрасывается пачкой)"""
+        suspicious_log.record(ip, request, status_code)
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.11 on 2026-10-18 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="timecapsule",
+            index=models.Index(
+                fields=["created_by", "-created_at", "-id"],
+                name="capsule_owner_keyset_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timecapsule",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="capsule_keyset_idx"
+            ),
+        ),
+    ]
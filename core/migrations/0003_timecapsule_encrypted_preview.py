@@ -0,0 +1,22 @@
+# Generated by Django 4.2.11 on 2026-10-18 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_capsule_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="timecapsule",
+            name="encrypted_preview",
+            field=models.TextField(
+                blank=True,
+                help_text="Первые символы сообщения, расшифровываются отдельно от полного текста",
+                verbose_name="Зашифрованное превью",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.11 on 2026-10-18 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_timecapsule_encrypted_preview"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="timecapsule",
+            index=models.Index(
+                fields=["created_by", "status", "scheduled_date"],
+                name="capsule_owner_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timecapsule",
+            index=models.Index(
+                fields=["status", "scheduled_date"], name="capsule_status_sched_idx"
+            ),
+        ),
+    ]
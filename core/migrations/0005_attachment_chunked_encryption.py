@@ -0,0 +1,25 @@
+# Generated by Django 4.2.11 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+
+def mark_existing_unencrypted(apps, schema_editor):
+    # До поблочного шифрования файлы сохранялись как есть
+    CapsuleAttachment = apps.get_model("core", "CapsuleAttachment")
+    CapsuleAttachment.objects.update(is_encrypted=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_capsule_status_schedule_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="capsuleattachment",
+            name="is_encrypted",
+            field=models.BooleanField(default=False, verbose_name="Зашифрован"),
+        ),
+        migrations.RunPython(mark_existing_unencrypted, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.11 on 2026-10-18 23:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_attachment_chunked_encryption"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttachmentUpload",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "file_name",
+                    models.CharField(max_length=255, verbose_name="Имя файла"),
+                ),
+                (
+                    "file_type",
+                    models.CharField(max_length=100, verbose_name="Тип файла"),
+                ),
+                ("total_size", models.BigIntegerField(verbose_name="Размер файла")),
+                ("part_size", models.IntegerField(verbose_name="Размер части")),
+                (
+                    "received_size",
+                    models.BigIntegerField(default=0, verbose_name="Получено байт"),
+                ),
+                (
+                    "storage_name",
+                    models.CharField(max_length=500, verbose_name="Файл в хранилище"),
+                ),
+                (
+                    "encryption_key_id",
+                    models.CharField(max_length=50, verbose_name="ID ключа шифрования"),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(
+                        blank=True, max_length=64, verbose_name="Хэш содержимого"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("uploading", "Загружается"),
+                            ("complete", "Загружено"),
+                        ],
+                        default="uploading",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Дата обновления"),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attachment_uploads",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Загрузка вложения",
+                "verbose_name_plural": "Загрузки вложений",
+                "indexes": [
+                    models.Index(
+                        fields=["status", "updated_at"],
+                        name="upload_status_updated_idx",
+                    )
+                ],
+            },
+        ),
+    ]
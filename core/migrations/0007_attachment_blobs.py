@@ -0,0 +1,82 @@
+# Generated by Django 4.2.11 on 2026-10-18 23:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_attachmentupload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttachmentBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(
+                        max_length=64, unique=True, verbose_name="Хэш содержимого"
+                    ),
+                ),
+                (
+                    "file",
+                    models.FileField(
+                        max_length=500, upload_to="blobs/", verbose_name="Файл"
+                    ),
+                ),
+                ("size", models.BigIntegerField(default=0, verbose_name="Размер")),
+                (
+                    "encryption_key_id",
+                    models.CharField(max_length=50, verbose_name="ID ключа шифрования"),
+                ),
+                (
+                    "ref_count",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Количество ссылок"
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Содержимое вложения",
+                "verbose_name_plural": "Содержимое вложений",
+            },
+        ),
+        migrations.AlterField(
+            model_name="capsuleattachment",
+            name="file",
+            field=models.FileField(
+                blank=True,
+                max_length=500,
+                upload_to="attachments/%Y/%m/%d/",
+                verbose_name="Файл",
+            ),
+        ),
+        migrations.AddField(
+            model_name="capsuleattachment",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="attachments",
+                to="core.attachmentblob",
+            ),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.11 on 2026-10-18 23:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_attachment_blobs"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="timecapsule",
+            name="encrypted_message",
+            field=models.TextField(blank=True, verbose_name="Зашифрованное сообщение"),
+        ),
+        migrations.CreateModel(
+            name="CampaignPayload",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(max_length=64, verbose_name="Хэш сообщения"),
+                ),
+                (
+                    "encrypted_message",
+                    models.TextField(verbose_name="Зашифрованное сообщение"),
+                ),
+                (
+                    "encrypted_preview",
+                    models.TextField(verbose_name="Зашифрованное превью"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="campaign_payloads",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сообщение рассылки",
+                "verbose_name_plural": "Сообщения рассылок",
+            },
+        ),
+        migrations.AddField(
+            model_name="timecapsule",
+            name="payload",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="capsules",
+                to="core.campaignpayload",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="campaignpayload",
+            constraint=models.UniqueConstraint(
+                fields=("created_by", "content_hash"), name="payload_owner_hash_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 4.2.11 on 2026-10-18 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_campaign_payloads"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "csv_file",
+                    models.FileField(
+                        max_length=500,
+                        upload_to="imports/%Y/%m/%d/",
+                        verbose_name="CSV файл",
+                    ),
+                ),
+                (
+                    "common_message",
+                    models.TextField(blank=True, verbose_name="Общее сообщение"),
+                ),
+                (
+                    "default_date",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Дата отправки по умолчанию"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "В очереди"),
+                            ("running", "Выполняется"),
+                            ("done", "Завершен"),
+                            ("failed", "Ошибка"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Статус",
+                    ),
+                ),
+                (
+                    "rows_total",
+                    models.IntegerField(
+                        blank=True, null=True, verbose_name="Строк в файле (оценка)"
+                    ),
+                ),
+                (
+                    "rows_done",
+                    models.IntegerField(default=0, verbose_name="Создано капсул"),
+                ),
+                (
+                    "rows_failed",
+                    models.IntegerField(default=0, verbose_name="Строк с ошибками"),
+                ),
+                (
+                    "report",
+                    models.FileField(
+                        blank=True,
+                        max_length=500,
+                        upload_to="imports/reports/",
+                        verbose_name="Отчет об ошибках",
+                    ),
+                ),
+                ("error", models.TextField(blank=True, verbose_name="Ошибка")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Начало обработки"
+                    ),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Окончание обработки"
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "template",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="import_jobs",
+                        to="core.messagetemplate",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Импорт CSV",
+                "verbose_name_plural": "Импорты CSV",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
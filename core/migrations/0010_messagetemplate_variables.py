@@ -0,0 +1,32 @@
+# Generated by Django 4.2.11 on 2026-10-18 23:00
+
+from django.db import migrations
+import re
+
+# Копия core.templating.VARIABLE_RE на момент миграции: историческая миграция
+# не должна зависеть от текущего кода приложения
+VARIABLE_RE = re.compile(r"\{\{ *(\w+) *\}\}")
+
+
+def extract_variables(content):
+    return list(dict.fromkeys(VARIABLE_RE.findall(content or "")))
+
+
+def fill_variables(apps, schema_editor):
+    # Переменные теперь вычисляются при сохранении шаблона
+    MessageTemplate = apps.get_model("core", "MessageTemplate")
+    templates = list(MessageTemplate.objects.only("id", "content", "variables"))
+    for template in templates:
+        template.variables = extract_variables(template.content)
+    MessageTemplate.objects.bulk_update(templates, ["variables"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_importjob"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_variables, migrations.RunPython.noop),
+    ]
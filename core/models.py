@@ -9,6 +9,7 @@ import base64
 import os
 import logging
 import time
+import uuid
 
 logger = logging.getLogger('core.encryption')
 
@@ -157,6 +158,66 @@ class EncryptionKey(models.Model):
         )
 
 
+class CampaignPayload(models.Model):
+    """
+    Общее зашифрованное сообщение рассылки.
+    Капсулы с побайтно одинаковым текстом ссылаются на одну запись:
+    шифрование выполняется один раз при создании и один раз на пачку при отправке.
+    """
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='campaign_payloads'
+    )
+    content_hash = models.CharField('Хэш сообщения', max_length=64)
+    encrypted_message = models.TextField('Зашифрованное сообщение')
+    encrypted_preview = models.TextField('Зашифрованное превью')
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Сообщение рассылки'
+        verbose_name_plural = 'Сообщения рассылок'
+        constraints = [
+            models.UniqueConstraint(fields=['created_by', 'content_hash'], name='payload_owner_hash_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.created_by_id})"
+
+    @classmethod
+    def for_message(cls, user, raw_message):
+        """Общее сообщение пользователя с таким текстом (шифруется только при создании)"""
+        import hashlib
+        from django.db import IntegrityError, transaction
+        from .encryption import key_manager
+
+        content_hash = hashlib.sha256(raw_message.encode()).hexdigest()
+        payload = cls.objects.filter(created_by=user, content_hash=content_hash).first()
+        if payload is not None:
+            return payload
+
+        encrypted_message, encrypted_preview = key_manager.encrypt_many(
+            [raw_message, TimeCapsule.make_preview(raw_message)]
+        )
+        try:
+            with transaction.atomic():
+                return cls.objects.create(
+                    created_by=user,
+                    content_hash=content_hash,
+                    encrypted_message=encrypted_message,
+                    encrypted_preview=encrypted_preview,
+                )
+        except IntegrityError:
+            # Параллельно создано такое же сообщение
+            return cls.objects.get(created_by=user, content_hash=content_hash)
+
+    def decrypt_message(self):
+        from .encryption import key_manager
+        return key_manager.decrypt_with_key_id(self.encrypted_message)
+
+
 class TimeCapsule(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Ожидает отправки'),
@@ -165,8 +226,23 @@ class TimeCapsule(models.Model):
         ('processing', 'В процессе отправки'),
     ]
 
+    PREVIEW_LENGTH = 100
+
     recipient_email = models.EmailField('Email получателя')
-    encrypted_message = models.TextField('Зашифрованное сообщение')
+    encrypted_message = models.TextField('Зашифрованное сообщение', blank=True)
+    encrypted_preview = models.TextField(
+        'Зашифрованное превью',
+        blank=True,
+        help_text='Первые символы сообщения, расшифровываются отдельно от полного текста'
+    )
+    # Общее сообщение рассылки (тогда encrypted_message пустое)
+    payload = models.ForeignKey(
+        CampaignPayload,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='capsules'
+    )
     scheduled_date = models.DateTimeField('Дата отправки')
     status = models.CharField(
         'Статус',
@@ -189,6 +265,14 @@ class TimeCapsule(models.Model):
         verbose_name = 'Капсула времени'
         verbose_name_plural = 'Капсулы времени'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset-пагинация по (created_at, id) для списков пользователя и админа
+            models.Index(fields=['created_by', '-created_at', '-id'], name='capsule_owner_keyset_idx'),
+            models.Index(fields=['-created_at', '-id'], name='capsule_keyset_idx'),
+            # Фильтры API по статусу и диапазону scheduled_date, выборка ожидающих к отправке
+            models.Index(fields=['created_by', 'status', 'scheduled_date'], name='capsule_owner_status_idx'),
+            models.Index(fields=['status', 'scheduled_date'], name='capsule_status_sched_idx'),
+        ]
 
     def __str__(self):
         return f"Капсула для {self.recipient_email} ({self.scheduled_date.date()})"
@@ -210,6 +294,9 @@ class TimeCapsule(models.Model):
             # Шифрование
             encrypted = key_manager.encrypt_with_key_id(raw_message)
             self.encrypted_message = encrypted
+            self.encrypted_preview = key_manager.encrypt_with_key_id(
+                self.make_preview(raw_message)
+            )
 
             # Логирование
             encryption_time = time.time() - start_time
@@ -246,7 +333,8 @@ class TimeCapsule(models.Model):
             from .encryption import key_manager
 
             # Дешифрование
-            decrypted = key_manager.decrypt_with_key_id(self.encrypted_message)
+            encrypted = self.payload.encrypted_message if self.payload_id else self.encrypted_message
+            decrypted = key_manager.decrypt_with_key_id(encrypted)
 
             # Логирование
             decryption_time = time.time() - start_time
@@ -273,6 +361,22 @@ class TimeCapsule(models.Model):
             )
             raise
 
+    @staticmethod
+    def make_preview(raw_message):
+        """Превью сообщения (первые PREVIEW_LENGTH символов)"""
+        if len(raw_message) > TimeCapsule.PREVIEW_LENGTH:
+            return raw_message[:TimeCapsule.PREVIEW_LENGTH] + '...'
+        return raw_message
+
+    def decrypt_preview(self):
+        """Дешифрование превью (для старых капсул без превью - из полного текста)"""
+        encrypted = self.payload.encrypted_preview if self.payload_id else self.encrypted_preview
+        if not encrypted:
+            return self.make_preview(self.decrypt_message())
+
+        from .encryption import key_manager
+        return key_manager.decrypt_with_key_id(encrypted)
+
     def mark_as_sent(self):
         """Отметить капсулу как отправленную"""
         self.status = 'sent'
@@ -376,27 +480,36 @@ class RealTimeMetrics(models.Model):
 
     @classmethod
     def update_metric(cls, key, value, ttl=None):
-        """Обновление метрики"""
-        metric, created = cls.objects.get_or_create(metric_key=key)
-        metric.metric_value = value
-
-        if ttl:
-            metric.expires_at = timezone.now() + timezone.timedelta(seconds=ttl)
-
-        metric.save()
-        return metric
+        """Обновление метрики (кэш + отложенное сохранение в БД)"""
+        from .metrics import metrics_store
+        return metrics_store.set(key, value, ttl)
 
     @classmethod
     def get_metric(cls, key, default=None):
         """Получение метрики"""
-        try:
-            metric = cls.objects.get(metric_key=key)
-            if metric.expires_at and metric.expires_at < timezone.now():
-                metric.delete()
-                return default
-            return metric.metric_value
-        except cls.DoesNotExist:
-            return default
+        from .metrics import metrics_store
+        return metrics_store.get(key, default)
+
+
+class AttachmentBlob(models.Model):
+    """
+    Зашифрованное содержимое вложения, общее для одинаковых файлов.
+    Адресуется хэшем открытого текста; ref_count - число ссылающихся вложений.
+    Последнее удаленное вложение удаляет блоб, файл затем убирает django_cleanup.
+    """
+    content_hash = models.CharField('Хэш содержимого', max_length=64, unique=True)
+    file = models.FileField('Файл', upload_to='blobs/', max_length=500)
+    size = models.BigIntegerField('Размер', default=0)
+    encryption_key_id = models.CharField('ID ключа шифрования', max_length=50)
+    ref_count = models.PositiveIntegerField('Количество ссылок', default=0)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Содержимое вложения'
+        verbose_name_plural = 'Содержимое вложений'
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.ref_count})"
 
 
 class CapsuleAttachment(models.Model):
@@ -409,7 +522,16 @@ class CapsuleAttachment(models.Model):
     file = models.FileField(
         'Файл',
         upload_to='attachments/%Y/%m/%d/',
-        max_length=500
+        max_length=500,
+        blank=True
+    )
+    # Новые вложения хранятся в общем блобе, file остается у старых записей
+    blob = models.ForeignKey(
+        AttachmentBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='attachments'
     )
     file_name = models.CharField(
         'Имя файла',
@@ -425,7 +547,7 @@ class CapsuleAttachment(models.Model):
     )
     is_encrypted = models.BooleanField(
         'Зашифрован',
-        default=True
+        default=False
     )
     encryption_key_id = models.CharField(
         'ID ключа шифрования',
@@ -443,7 +565,12 @@ class CapsuleAttachment(models.Model):
         verbose_name_plural = 'Вложения'
 
     def __str__(self):
-        return f"{self.file_name} ({self.capsule.id})"
+        return f"{self.file_name} ({self.capsule_id})"
+
+    @property
+    def stored_file(self):
+        """Файл с содержимым: общий блоб или собственный файл старой записи"""
+        return self.blob.file if self.blob_id else self.file
 
     def save(self, *args, **kwargs):
         """Автоматическое заполнение полей при сохранении"""
@@ -461,6 +588,61 @@ class CapsuleAttachment(models.Model):
         super().save(*args, **kwargs)
 
 
+class AttachmentUpload(models.Model):
+    """
+    Сессия возобновляемой загрузки вложения частями фиксированного размера.
+    Каждая часть шифруется при получении и дописывается в итоговый файл хранилища.
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Загружается'),
+        ('complete', 'Загружено'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='attachment_uploads'
+    )
+    file_name = models.CharField('Имя файла', max_length=255)
+    file_type = models.CharField('Тип файла', max_length=100)
+    total_size = models.BigIntegerField('Размер файла')
+    part_size = models.IntegerField('Размер части')
+    received_size = models.BigIntegerField('Получено байт', default=0)
+    storage_name = models.CharField('Файл в хранилище', max_length=500)
+    encryption_key_id = models.CharField('ID ключа шифрования', max_length=50)
+    content_hash = models.CharField('Хэш содержимого', max_length=64, blank=True)
+    status = models.CharField(
+        'Статус',
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='uploading'
+    )
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата обновления', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Загрузка вложения'
+        verbose_name_plural = 'Загрузки вложений'
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.received_size}/{self.total_size})"
+
+    @property
+    def part_count(self):
+        return max(1, -(-self.total_size // self.part_size))
+
+    @property
+    def next_part(self):
+        """Номер следующей ожидаемой части (None - все получены)"""
+        if self.received_size >= self.total_size:
+            return None
+        return self.received_size // self.part_size
+
+
 class MessageTemplate(models.Model):
     """Шаблон сообщения для капсул"""
     CATEGORY_CHOICES = [
@@ -523,17 +705,79 @@ class MessageTemplate(models.Model):
     def __str__(self):
         return f"{self.name} ({self.get_category_display()})"
 
-    def render(self, context=None):
-        """Рендеринг шаблона с подстановкой значений"""
-        from django.template import Template, Context
+    def save(self, *args, **kwargs):
+        # Переменные вычисляются при сохранении, а не при каждом обращении
+        from .templating import extract_variables
+        self.variables = extract_variables(self.content)
 
-        template = Template(self.content)
-        context = Context(context or {})
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'variables'}
+        super().save(*args, **kwargs)
 
-        return template.render(context)
+    def render(self, context=None):
+        """Рендеринг шаблона с подстановкой значений (скомпилированный шаблон из кэша процесса)"""
+        from .templating import get_compiled_template
+        return get_compiled_template(self).render(context)
 
     def get_variables_list(self):
         """Получение списка переменных из шаблона"""
-        import re
-        variables = re.findall(r'\{\{(\w+)\}\}', self.content)
-        return list(set(variables))
\ No newline at end of file
+        from .templating import get_compiled_template
+        return list(get_compiled_template(self).variables)
+
+
+class ImportJob(models.Model):
+    """
+    Фоновый импорт капсул из CSV.
+    Файл сохраняется при загрузке, обработка идет пачками в задаче Celery,
+    счетчики строк обновляются после каждой пачки.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Завершен'),
+        ('failed', 'Ошибка'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='import_jobs'
+    )
+    csv_file = models.FileField('CSV файл', upload_to='imports/%Y/%m/%d/', max_length=500)
+    template = models.ForeignKey(
+        MessageTemplate,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='import_jobs'
+    )
+    common_message = models.TextField('Общее сообщение', blank=True)
+    default_date = models.DateTimeField('Дата отправки по умолчанию', null=True, blank=True)
+    status = models.CharField(
+        'Статус',
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending'
+    )
+    rows_total = models.IntegerField('Строк в файле (оценка)', null=True, blank=True)
+    rows_done = models.IntegerField('Создано капсул', default=0)
+    rows_failed = models.IntegerField('Строк с ошибками', default=0)
+    report = models.FileField('Отчет об ошибках', upload_to='imports/reports/', max_length=500, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    started_at = models.DateTimeField('Начало обработки', null=True, blank=True)
+    finished_at = models.DateTimeField('Окончание обработки', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Импорт CSV'
+        verbose_name_plural = 'Импорты CSV'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Импорт {self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
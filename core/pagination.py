@@ -0,0 +1,165 @@
+# core/pagination.py
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+import re
+
+
+class InvalidCursor(ValueError):
+    """Некорректный или поврежденный курсор"""
+
+
+def encode_cursor(obj, reverse=False):
+    """Непрозрачный курсор из позиции (created_at, id) объекта или строки .values()"""
+    if isinstance(obj, dict):
+        created_at, pk = obj['created_at'], obj['id']
+    else:
+        created_at, pk = obj.created_at, obj.pk
+    raw = f"{created_at.isoformat()}|{pk}|{'p' if reverse else 'n'}"
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбор курсора: (created_at, id, reverse)"""
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk, direction = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk), direction == 'p'
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Неверный курсор')
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк. На PostgreSQL берется из плана запроса (EXPLAIN),
+    без полного COUNT(*); на остальных СУБД - обычный count().
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    match = re.search(r'rows=(\d+)', plan)
+    return int(match.group(1)) if match else None
+
+
+class KeysetPage:
+    """Страница keyset-пагинации по (created_at, id), от новых к старым"""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.count_estimate = None
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], reverse=True)
+        return None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_keyset(queryset, cursor=None, page_size=20):
+    """
+    Keyset-пагинация: WHERE (created_at, id) < (курсор) ORDER BY created_at, id DESC.
+    Стоимость любой страницы одинакова, OFFSET и COUNT(*) не используются.
+    """
+    if not cursor:
+        rows = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+        return KeysetPage(rows[:page_size], len(rows) > page_size, False)
+
+    created_at, pk, reverse = decode_cursor(cursor)
+
+    if reverse:
+        rows = list(queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+        ).order_by('created_at', 'id')[:page_size + 1])
+        has_previous = len(rows) > page_size
+        return KeysetPage(rows[:page_size][::-1], True, has_previous)
+
+    rows = list(queryset.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+    ).order_by('-created_at', '-id')[:page_size + 1])
+    return KeysetPage(rows[:page_size], len(rows) > page_size, True)
+
+
+class KeysetPagination(BasePagination):
+    """DRF-пагинация по курсору (created_at, id) с опциональной оценкой количества"""
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE or 20
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+
+        try:
+            self.page = paginate_keyset(
+                queryset,
+                cursor=request.query_params.get(self.cursor_query_param),
+                page_size=self.get_page_size(request)
+            )
+        except InvalidCursor as e:
+            raise NotFound(str(e))
+
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.page.count_estimate = estimate_count(queryset)
+
+        return self.page.object_list
+
+    def get_link(self, cursor):
+        if not cursor:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+        }
+        if self.page.count_estimate is not None:
+            payload['count_estimate'] = self.page.count_estimate
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'count_estimate': {'type': 'integer'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,138 @@
+# core/ratelimit.py
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset'])
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'число/период' (10/m, 100/h, 1000/d) -> (число, период в секундах)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS.get(period.lower(), 60)
+
+
+def incr_counter(key, timeout, delta=1):
+    """
+    Атомарное увеличение счетчика в общем кэше; новый счетчик создается с TTL timeout.
+    На Redis - INCRBY и EXPIRE NX (Redis 7+) в MULTI/EXEC: RedisCache.incr делает
+    EXISTS и затем INCRBY, и истекший между ними ключ создается заново без TTL.
+    """
+    backend = caches['default']
+    if isinstance(backend, RedisCache):
+        key = backend.make_and_validate_key(key)
+        client = backend._cache.get_client(key, write=True)
+        with client.pipeline() as pipe:
+            pipe.incrby(key, delta)
+            pipe.expire(key, timeout, nx=True)
+            count, _ = pipe.execute()
+        return count
+
+    # Обычный случай - один INCR; счетчик создается при первом увеличении
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        pass
+    if cache.add(key, delta, timeout):
+        return delta
+    # Параллельный запрос успел создать счетчик
+    return cache.incr(key, delta)
+
+
+class BaseRateLimiter:
+    """
+    Ограничение частоты по фиксированным окнам: один счетчик на ключ и окно.
+    hit() стоит O(1) независимо от лимита.
+    """
+
+    def hit(self, key, limit, period):
+        now = time.time()
+        window = int(now // period)
+        count = self.incr(f"{key}:{window}", period)
+        return RateLimitResult(
+            allowed=count <= limit,
+            limit=limit,
+            remaining=max(limit - count, 0),
+            reset=(window + 1) * period,
+        )
+
+    def incr(self, key, period):
+        raise NotImplementedError
+
+
+class CacheRateLimiter(BaseRateLimiter):
+    """
+    Счетчики в общем кэше (incr_counter): лимит общий для всех воркеров без гонок
+    чтения-записи, а счетчик не может остаться без TTL.
+    """
+
+    def __init__(self, key_prefix='rl'):
+        self.key_prefix = key_prefix
+
+    def incr(self, key, period):
+        # Запас к TTL, чтобы счетчик не истек посреди своего окна
+        return incr_counter(f"{self.key_prefix}:{key}", period + 1)
+
+
+class LocalRateLimiter(BaseRateLimiter):
+    """Счетчики в памяти процесса (тесты, разработка, запасной вариант без кэша)"""
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._last_prune = time.monotonic()
+
+    def incr(self, key, period):
+        now = time.time()
+        with self._lock:
+            count, expires_at = self._counters.get(key, (0, 0))
+            if expires_at <= now:
+                count, expires_at = 0, now + period
+            count += 1
+            self._counters[key] = (count, expires_at)
+
+            if time.monotonic() - self._last_prune >= 60:
+                self._prune(now)
+        return count
+
+    def _prune(self, now):
+        self._counters = {key: item for key, item in self._counters.items() if item[1] > now}
+        self._last_prune = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+
+
+class FallbackRateLimiter(BaseRateLimiter):
+    """Общий кэш, а при его недоступности - счетчики процесса"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    def incr(self, key, period):
+        try:
+            return self.primary.incr(key, period)
+        except Exception as e:
+            logger.warning(f"Кэш недоступен для ограничения частоты ({e}), используются счетчики процесса")
+            return self.fallback.incr(key, period)
+
+
+def create_rate_limiter():
+    config = getattr(settings, 'RATE_LIMITER', {})
+    if config.get('BACKEND', 'cache') == 'local':
+        return LocalRateLimiter()
+    return FallbackRateLimiter(CacheRateLimiter(config.get('KEY_PREFIX', 'rl')), LocalRateLimiter())
+
+
+# Общий ограничитель для IPFilterMiddleware и декоратора rate_limit
+rate_limiter = create_rate_limiter()
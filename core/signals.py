@@ -0,0 +1,60 @@
+# core/signals.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .api.authentication import invalidate_token
+from .attachments import release_blob
+from .models import CapsuleAttachment, TimeCapsule
+from .stats import bump_stats_version
+
+
+@receiver(user_logged_in)
+def store_last_login_ip(sender, request, user, **kwargs):
+    """Сохранение IP последнего входа (используется для географии в статистике)"""
+    if request is None or not hasattr(user, 'last_login_ip'):
+        return
+
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0].strip()
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+
+    if ip and ip != user.last_login_ip:
+        user.last_login_ip = ip
+        user.save(update_fields=['last_login_ip'])
+
+
+@receiver(post_save, sender=TimeCapsule)
+@receiver(post_delete, sender=TimeCapsule)
+def invalidate_capsule_stats(sender, **kwargs):
+    """Инвалидация кэша статистики при изменении капсул"""
+    bump_stats_version()
+
+
+@receiver(post_delete, sender=CapsuleAttachment)
+def release_attachment_blob(sender, instance, **kwargs):
+    """Снятие ссылки на общий блоб при удалении вложения"""
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_stats(sender, created, **kwargs):
+    """Инвалидация кэша статистики при появлении пользователей"""
+    if created:
+        bump_stats_version()
+
+
+@receiver(post_delete, sender=get_user_model())
+def invalidate_deleted_user_stats(sender, **kwargs):
+    """Инвалидация кэша статистики при удалении пользователей"""
+    bump_stats_version()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Удаленный токен не должен продолжать работать из кэша"""
+    invalidate_token(instance.key)
@@ -1,22 +1,90 @@
 from django.db.models import Count, Avg, Max
+from django.core.cache import cache
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+from .geoip import get_reader, lookup_country
 import tldextract
-import geoip2.database
+import hashlib
 import logging
+import math
+import time
 
 logger = logging.getLogger(__name__)
 
+STATS_VERSION_KEY = 'stats_version'
+
+# Типы статистики, зависящие от текущего времени (сегодня, окно от текущего момента)
+TIME_DEPENDENT_STATS = ('summary', 'daily', 'dashboard', 'forecast')
+
+FORECAST_GRANULARITIES = ('minute', 'hour', 'day')
+FORECAST_STEPS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+
+def get_stats_version():
+    """Текущая версия статистики (метка времени последнего изменения данных)"""
+    version = cache.get(STATS_VERSION_KEY)
+    if version is None:
+        cache.add(STATS_VERSION_KEY, time.time(), None)
+        version = cache.get(STATS_VERSION_KEY, time.time())
+    return version
+
+
+def bump_stats_version():
+    """Инвалидация всех закэшированных данных статистики"""
+    cache.set(STATS_VERSION_KEY, time.time(), None)
+
+
+def get_cached_stats(name, builder, timeout=None):
+    """Получение данных из версионированного кэша, при промахе - вызов builder()"""
+    cache_key = f"stats:{get_stats_version()}:{name}"
+    data = cache.get(cache_key)
+
+    if data is None:
+        data = builder()
+        timeout = timeout or getattr(settings, 'STATS_CACHE_TIMEOUT', 300)
+        cache.set(cache_key, data, timeout)
+
+    return data
+
+
+def get_stats_validator(request):
+    """
+    Метка для ETag и Last-Modified: версия данных, а для статистики, которая
+    меняется со временем без записей в базу (сводка за сегодня, прогноз, день
+    без даты), - не раньше начала текущего интервала STATS_CACHE_TIMEOUT.
+    Так клиент не получает 304 на данные, которые сервер уже считает устаревшими.
+    """
+    version = get_stats_version()
+    stats_type = request.GET.get('type', 'summary')
+    if stats_type in TIME_DEPENDENT_STATS and not (stats_type == 'daily' and request.GET.get('date')):
+        timeout = getattr(settings, 'STATS_CACHE_TIMEOUT', 300)
+        version = max(version, time.time() // timeout * timeout)
+    return version
+
+
+def stats_etag(request, *args, **kwargs):
+    """ETag для условных GET-запросов к статистике"""
+    scope = 'staff' if request.user.is_staff else f"user{request.user.pk}"
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()[:8]
+    return f"{scope}-{query}-{get_stats_validator(request)}"
+
+
+def stats_last_modified(request, *args, **kwargs):
+    """Last-Modified для условных GET-запросов к статистике"""
+    return datetime.fromtimestamp(get_stats_validator(request), tz=dt_timezone.utc)
+
 
 class StatisticsCollector:
     """Сборщик статистики"""
 
     def __init__(self):
-        self.geoip_reader = None
-        try:
-            self.geoip_reader = geoip2.database.Reader('GeoLite2-City.mmdb')
-        except:
-            logger.warning("GeoIP база данных не найдена")
+        # Общий для процесса reader, база не переоткрывается на каждый запрос
+        self.geoip_reader = get_reader()
 
     def collect_daily_stats(self, date=None):
         """Сбор ежедневной статистики"""
@@ -63,23 +131,20 @@ class StatisticsCollector:
         countries = {}
         recipients = set()
 
-        for capsule in capsules:
+        rows = capsules.values_list('recipient_email', 'created_by__last_login_ip')
+
+        for recipient_email, last_login_ip in rows.iterator():
             # Уникальные получатели
-            recipients.add(capsule.recipient_email)
+            recipients.add(recipient_email)
 
             # Домены
-            domain = tldextract.extract(capsule.recipient_email).registered_domain
+            domain = tldextract.extract(recipient_email).registered_domain
             domains[domain] = domains.get(domain, 0) + 1
 
-            # География (если есть GeoIP)
+            # География по последнему IP входа автора капсулы
             if self.geoip_reader:
-                try:
-                    # Извлечение IP из email (в реальном приложении нужен отдельный сбор IP)
-                    # Здесь упрощенный пример
-                    country = "Unknown"
-                    countries[country] = countries.get(country, 0) + 1
-                except:
-                    pass
+                country = lookup_country(last_login_ip)
+                countries[country] = countries.get(country, 0) + 1
 
         stats['unique_recipients'] = len(recipients)
         stats['top_domains'] = sorted(
@@ -130,6 +195,25 @@ class StatisticsCollector:
         # Обновление каждые 5 минут
         return metrics
 
+    def get_status_totals(self, user=None):
+        """Количество капсул по статусам одним GROUP BY запросом"""
+        from .models import TimeCapsule
+
+        capsules = TimeCapsule.objects.all()
+        if user is not None:
+            capsules = capsules.filter(created_by=user)
+
+        counts = dict(
+            capsules.order_by().values_list('status').annotate(count=Count('id'))
+        )
+
+        return {
+            'total_capsules': sum(counts.values()),
+            'pending': counts.get('pending', 0),
+            'sent': counts.get('sent', 0),
+            'failed': counts.get('failed', 0),
+        }
+
     def calculate_success_rate(self):
         """Расчет процента успешных отправок"""
         from .models import TimeCapsule
@@ -146,14 +230,17 @@ class StatisticsCollector:
     def calculate_avg_processing_time(self):
         """Расчет среднего времени обработки"""
         from .models import TimeCapsule
-        from django.db.models import Avg
+        from django.db.models import Avg, DurationField, ExpressionWrapper, F
 
         result = TimeCapsule.objects.filter(
             status='sent',
             sent_at__isnull=False,
             created_at__isnull=False
         ).aggregate(
-            avg_time=Avg('sent_at' - 'created_at')
+            avg_time=Avg(ExpressionWrapper(
+                F('sent_at') - F('created_at'),
+                output_field=DurationField()
+            ))
         )
 
         if result['avg_time']:
@@ -202,4 +289,68 @@ class StatisticsCollector:
             }
         }
 
-        return dashboard_data
\ No newline at end of file
+        return dashboard_data
+
+    def get_delivery_forecast(self, days=7, granularity='hour'):
+        """
+        Прогноз нагрузки доставки: гистограмма ожидающих капсул по scheduled_date
+        на ближайшие days дней (один запрос date_trunc + GROUP BY, с кэшированием).
+        Интервалы с аномально большим числом капсул помечаются как пики.
+        """
+        if granularity not in FORECAST_GRANULARITIES:
+            raise ValueError(f"Неизвестная гранулярность: {granularity}")
+
+        now = timezone.now()
+        start = now.replace(second=0, microsecond=0)
+        if granularity in ('hour', 'day'):
+            start = start.replace(minute=0)
+        if granularity == 'day':
+            start = start.replace(hour=0)
+
+        return get_cached_stats(
+            f"forecast:{granularity}:{days}:{start.isoformat()}",
+            lambda: self.build_delivery_forecast(start, days, granularity)
+        )
+
+    def build_delivery_forecast(self, start, days, granularity):
+        """Расчет прогноза нагрузки при промахе кэша"""
+        from .models import TimeCapsule
+        from django.db.models.functions import Trunc
+        import statistics
+
+        config = getattr(settings, 'DELIVERY_FORECAST', {})
+        spike_factor = config.get('SPIKE_FACTOR', 5)
+        spike_min_count = config.get('SPIKE_MIN_COUNT', 100)
+
+        end = start + timedelta(days=days)
+        rows = TimeCapsule.objects.filter(
+            status='pending',
+            scheduled_date__gte=start,
+            scheduled_date__lt=end
+        ).annotate(
+            bucket=Trunc('scheduled_date', granularity)
+        ).order_by('bucket').values('bucket').annotate(count=Count('id'))
+
+        buckets = [{'time': row['bucket'].isoformat(), 'count': row['count']} for row in rows]
+
+        # База для поиска пиков - медиана по всем интервалам окна, пустые считаются нулями.
+        # Иначе при редких капсулах база равна самим пикам и они не находятся.
+        total = math.ceil((end - start) / FORECAST_STEPS[granularity])
+        counts = [b['count'] for b in buckets] + [0] * max(total - len(buckets), 0)
+        baseline = statistics.median(counts) if counts else 0
+        for bucket in buckets:
+            bucket['spike'] = (
+                bucket['count'] >= spike_min_count and
+                bucket['count'] >= baseline * spike_factor
+            )
+
+        return {
+            'granularity': granularity,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'total_pending': sum(b['count'] for b in buckets),
+            'baseline': baseline,
+            'peak': max(buckets, key=lambda b: b['count']) if buckets else None,
+            'spikes': [b for b in buckets if b['spike']],
+            'buckets': buckets,
+        }
@@ -0,0 +1,241 @@
+# core/suspicious.py
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+import atexit
+import hashlib
+import os
+import threading
+import logging
+
+from .ratelimit import incr_counter
+
+logger = logging.getLogger(__name__)
+
+# Статусы и методы с отдельными счетчиками, остальные учитываются как OTHER
+STATUSES = ('400', '403')
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+OTHER = 'OTHER'
+
+
+class SuspiciousRequestLog:
+    """
+    Агрегированный журнал подозрительных запросов (ответы 400/403).
+    События копятся в процессе в ограниченном буфере с агрегацией по (IP, путь)
+    и раз в FLUSH_INTERVAL секунд сбрасываются в общий кэш по таймеру процесса.
+    У каждого агрегата свои ключи, счетчики увеличиваются атомарно (incr_counter),
+    поэтому одновременный сброс нескольких воркеров ничего не теряет, а стоимость
+    сброса зависит от числа агрегатов в буфере, а не от накопленной истории.
+    Индекс агрегатов - кольцо из MAX_ENTRIES слотов: новый агрегат занимает слот
+    по атомарному номеру и вытесняет самый давний.
+    """
+
+    key_prefix = 'suspicious'
+
+    def __init__(self):
+        config = getattr(settings, 'SUSPICIOUS_REQUESTS', {})
+        self.buffer_size = config.get('BUFFER_SIZE', 1000)
+        self.max_entries = config.get('MAX_ENTRIES', 5000)
+        self.flush_interval = config.get('FLUSH_INTERVAL', 10)
+        self.ttl = config.get('TTL', 3600)
+
+        self._buffer = OrderedDict()
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._timer = None
+        self._timer_pid = None
+
+    def make_key(self, *parts):
+        return ':'.join((self.key_prefix,) + tuple(str(part) for part in parts))
+
+    def get_aggregate_id(self, ip, path):
+        return hashlib.md5(f"{ip} {path}".encode()).hexdigest()
+
+    def get_counter_keys(self, aggregate_id):
+        """{(поле, имя): ключ кэша} счетчиков агрегата"""
+        keys = {('count', None): self.make_key(aggregate_id, 'count')}
+        for field, names in (('statuses', STATUSES), ('methods', METHODS)):
+            for name in names + (OTHER,):
+                keys[(field, name)] = self.make_key(aggregate_id, field, name)
+        return keys
+
+    def record(self, ip, request, status_code):
+        """Учет одного подозрительного запроса (без копирования тела запроса)"""
+        key = (ip, request.path)
+        now = timezone.now().isoformat()
+
+        with self._lock:
+            entry = self._buffer.get(key)
+            if entry is None:
+                entry = {
+                    'count': 0,
+                    'statuses': {},
+                    'methods': {},
+                    'user_agent': '',
+                    'first_seen': now,
+                    'last_seen': now,
+                }
+                self._buffer[key] = entry
+                while len(self._buffer) > self.buffer_size:
+                    self._buffer.popitem(last=False)
+                    self._dropped += 1
+                new = True
+            else:
+                self._buffer.move_to_end(key)
+                new = False
+
+            status = str(status_code) if str(status_code) in STATUSES else OTHER
+            method = request.method if request.method in METHODS else OTHER
+            entry['count'] += 1
+            entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+            entry['methods'][method] = entry['methods'].get(method, 0) + 1
+            entry['user_agent'] = request.META.get('HTTP_USER_AGENT', '')[:200]
+            entry['last_seen'] = now
+
+        # В лог - первое событие агрегата в окне, а не каждое
+        if new:
+            logger.warning(f"Подозрительный запрос от {ip}: {request.path}")
+
+        self._ensure_timer()
+
+    def _ensure_timer(self):
+        """Сброс буфера раз в flush_interval в процессе, где он копится; после fork - новый таймер"""
+        pid = os.getpid()
+        if self._timer_pid == pid and self._timer is not None and self._timer.is_alive():
+            return
+
+        with self._lock:
+            if self._timer_pid == pid and self._timer is not None and self._timer.is_alive():
+                return
+            self._timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+            self._timer.daemon = True
+            self._timer_pid = pid
+            self._timer.start()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._timer = None
+                has_pending = bool(self._buffer)
+            if has_pending:
+                self._ensure_timer()
+
+    def flush(self):
+        """Сброс буфера процесса в общий кэш: атомарные счетчики, без чтения истории"""
+        with self._lock:
+            buffer, self._buffer = self._buffer, OrderedDict()
+            dropped, self._dropped = self._dropped, 0
+
+        if not buffer and not dropped:
+            return 0
+
+        try:
+            self._save(buffer, dropped)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения журнала подозрительных запросов: {e}")
+            return 0
+
+        return len(buffer)
+
+    def _save(self, buffer, dropped):
+        ids = {key: self.get_aggregate_id(*key) for key in buffer}
+        info_keys = {key: self.make_key(aggregate_id, 'info') for key, aggregate_id in ids.items()}
+        infos = cache.get_many(list(info_keys.values()))
+        slots = cache.get_many([self.make_key('slot', info['slot']) for info in infos.values()])
+
+        for key, entry in buffer.items():
+            aggregate_id = ids[key]
+            info = infos.get(info_keys[key])
+            # Новый агрегат или вытесненный из индекса другим - занимает следующий слот
+            if info is None or slots.get(self.make_key('slot', info['slot'])) != aggregate_id:
+                first_seen = info['first_seen'] if info else entry['first_seen']
+                dropped += self._register(aggregate_id, key, first_seen)
+
+            counter_keys = self.get_counter_keys(aggregate_id)
+            incr_counter(counter_keys[('count', None)], self.ttl, entry['count'])
+            for field in ('statuses', 'methods'):
+                for name, count in entry[field].items():
+                    incr_counter(counter_keys[(field, name)], self.ttl, count)
+
+            cache.set(self.make_key(aggregate_id, 'meta'), {
+                'user_agent': entry['user_agent'],
+                'last_seen': entry['last_seen'],
+            }, self.ttl)
+
+        if dropped:
+            incr_counter(self.make_key('dropped'), self.ttl, dropped)
+
+    def _register(self, aggregate_id, key, first_seen):
+        """Запись агрегата в слот индекса; возвращает 1, если вытеснен давний агрегат"""
+        number = incr_counter(self.make_key('seq'), self.ttl)
+        slot = number % self.max_entries
+        cache.set(self.make_key('slot', slot), aggregate_id, self.ttl)
+        cache.set(self.make_key(aggregate_id, 'info'), {
+            'ip': key[0],
+            'path': key[1],
+            'first_seen': first_seen,
+            'slot': slot,
+        }, self.ttl)
+        return 1 if number > self.max_entries else 0
+
+    def _get_aggregate_ids(self):
+        slots = cache.get_many([self.make_key('slot', slot) for slot in range(self.max_entries)])
+        return list(dict.fromkeys(slots.values()))
+
+    def get_entries(self, limit=None):
+        """Агрегаты из кэша (с несброшенным буфером своего процесса), по убыванию числа событий"""
+        self.flush()
+
+        aggregate_ids = self._get_aggregate_ids()
+        keys = {}
+        for aggregate_id in aggregate_ids:
+            keys[aggregate_id] = self.get_counter_keys(aggregate_id)
+            keys[aggregate_id][('info', None)] = self.make_key(aggregate_id, 'info')
+            keys[aggregate_id][('meta', None)] = self.make_key(aggregate_id, 'meta')
+        values = cache.get_many([key for aggregate_keys in keys.values() for key in aggregate_keys.values()])
+
+        entries = []
+        for aggregate_id, aggregate_keys in keys.items():
+            info = values.get(aggregate_keys.pop(('info', None)))
+            meta = values.get(aggregate_keys.pop(('meta', None))) or {}
+            count = values.get(aggregate_keys.pop(('count', None)))
+            if info is None or not count:
+                continue
+
+            entry = {
+                'ip': info['ip'],
+                'path': info['path'],
+                'count': count,
+                'statuses': {},
+                'methods': {},
+                'user_agent': meta.get('user_agent', ''),
+                'first_seen': info['first_seen'],
+                'last_seen': meta.get('last_seen', info['first_seen']),
+            }
+            for (field, name), key in aggregate_keys.items():
+                if values.get(key):
+                    entry[field][name] = values[key]
+            entries.append(entry)
+
+        entries.sort(key=lambda entry: entry['count'], reverse=True)
+        return entries[:limit] if limit else entries, cache.get(self.make_key('dropped')) or 0
+
+    def clear(self):
+        with self._lock:
+            self._buffer.clear()
+            self._dropped = 0
+
+        keys = [self.make_key('seq'), self.make_key('dropped')]
+        keys += [self.make_key('slot', slot) for slot in range(self.max_entries)]
+        for aggregate_id in self._get_aggregate_ids():
+            keys += list(self.get_counter_keys(aggregate_id).values())
+            keys += [self.make_key(aggregate_id, 'info'), self.make_key(aggregate_id, 'meta')]
+        cache.delete_many(keys)
+
+
+# Глобальный журнал для IPFilterMiddleware
+suspicious_log = SuspiciousRequestLog()
+atexit.register(suspicious_log.flush)
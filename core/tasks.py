@@ -7,10 +7,18 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def send_time_capsule(capsule_id):
-    """Функция для отправки капсулы времени"""
+# Размер пачки при отправке наступивших капсул
+DISPATCH_BATCH_SIZE = 500
+
+
+def send_time_capsule(capsule_id, capsule=None, message=None):
+    """
+    Функция для отправки капсулы времени.
+    capsule и message можно передать уже загруженными (пакетная отправка).
+    """
     try:
-        capsule = TimeCapsule.objects.get(id=capsule_id)
+        if capsule is None:
+            capsule = TimeCapsule.objects.select_related('payload').get(id=capsule_id)
 
         # Проверка времени отправки
         if capsule.scheduled_date > timezone.now():
@@ -28,7 +36,8 @@ def send_time_capsule(capsule_id):
 
         # Дешифрование сообщения
         try:
-            message = capsule.decrypt_message()
+            if message is None:
+                message = capsule.decrypt_message()
         except Exception as e:
             capsule.mark_as_failed(f"Ошибка дешифрования: {str(e)}")
             logger.error(f"Ошибка дешифрования капсулы {capsule_id}: {str(e)}")
@@ -81,9 +90,63 @@ def check_and_send_pending_capsules():
     pending_capsules = TimeCapsule.objects.filter(
         status='pending',
         scheduled_date__lte=now
-    )
-
-    for capsule in pending_capsules:
-        send_time_capsule(capsule.id)
-
-    return pending_capsules.count()
\ No newline at end of file
+    ).select_related('payload').order_by('id')
+
+    # Общие сообщения рассылок расшифровываются один раз на пачку
+    processed = 0
+    last_id = 0
+    while True:
+        batch = list(pending_capsules.filter(id__gt=last_id)[:DISPATCH_BATCH_SIZE])
+        if not batch:
+            break
+
+        payload_messages = {}
+        for capsule in batch:
+            message = None
+            if capsule.payload_id:
+                if capsule.payload_id not in payload_messages:
+                    try:
+                        payload_messages[capsule.payload_id] = capsule.payload.decrypt_message()
+                    except Exception as e:
+                        logger.error(f"Ошибка дешифрования сообщения рассылки {capsule.payload_id}: {e}")
+                        payload_messages[capsule.payload_id] = None
+                message = payload_messages[capsule.payload_id]
+
+            send_time_capsule(capsule.id, capsule=capsule, message=message)
+            processed += 1
+
+        last_id = batch[-1].id
+
+    return processed
+
+def flush_realtime_metrics():
+    """Сброс накопленных метрик в таблицу RealTimeMetrics"""
+    from .metrics import metrics_store
+    return metrics_store.flush()
+
+
+def purge_expired_metrics():
+    """Периодическая массовая очистка истекших метрик"""
+    from .metrics import metrics_store
+    return metrics_store.purge_expired()
+
+
+def purge_stale_uploads():
+    """Удаление брошенных загрузок вложений по частям"""
+    from .uploads import purge_stale_uploads
+    return purge_stale_uploads()
+
+
+def purge_unused_payloads():
+    """Удаление общих сообщений рассылок, на которые не ссылается ни одна капсула"""
+    from .models import CampaignPayload
+    deleted, _ = CampaignPayload.objects.filter(capsules__isnull=True).delete()
+    if deleted:
+        logger.info(f"Удалено неиспользуемых сообщений рассылок: {deleted}")
+    return deleted
+
+
+def run_import_job(job_id):
+    """Фоновый импорт капсул из CSV"""
+    from .imports import run_import_job
+    return run_import_job(job_id)
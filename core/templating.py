@@ -0,0 +1,179 @@
+# core/templating.py
+from collections import OrderedDict
+from django.conf import settings
+import hashlib
+import html
+import re
+import threading
+
+# Простая подстановка {{имя}} (допускаются пробелы внутри скобок, как в Django)
+VARIABLE_RE = re.compile(r'\{\{ *(\w+) *\}\}')
+
+# Имена, которые Django трактует как литералы, а не переменные контекста
+LITERAL_NAMES = {'True', 'False', 'None'}
+
+# Подстановка в общее сообщение: {{ключ}} - точное имя колонки CSV (без фигурных скобок)
+PLACEHOLDER_RE = re.compile(r'\{\{([^{}]*)\}\}')
+
+TEMPLATE_CACHE_SIZE = getattr(settings, 'MESSAGE_TEMPLATE_CACHE_SIZE', 256)
+
+
+def extract_variables(content):
+    """Переменные {{имя}} в порядке первого появления, без повторов"""
+    return list(dict.fromkeys(VARIABLE_RE.findall(content or '')))
+
+
+def content_hash(content):
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+class CompiledTemplate:
+    """
+    Скомпилированный текст шаблона.
+    Если в тексте только {{имя}}, он разбивается на литералы и имена и рендерится
+    склейкой строк без шаблонизатора Django (с тем же экранированием значений).
+    Иначе (фильтры, теги, атрибуты) - через django.template.Template.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.variables = extract_variables(content)
+        self.parts = self._split(content)
+        self.template = None
+
+        if self.parts is None:
+            from django.template import Template
+            self.template = Template(content)
+
+    @staticmethod
+    def _split(content):
+        """[литерал, имя, литерал, ...] или None, если нужен шаблонизатор Django"""
+        parts = VARIABLE_RE.split(content)
+        literals, names = parts[::2], parts[1::2]
+
+        if any(name in LITERAL_NAMES or name.startswith('_') or name[0].isdigit() for name in names):
+            return None
+        for index, literal in enumerate(literals):
+            if '{{' in literal or '{%' in literal or '{#' in literal:
+                return None
+            # '{' перед '{{имя}}' Django разобрал бы как часть тега
+            if index < len(names) and literal.endswith('{'):
+                return None
+        return parts
+
+    @property
+    def is_simple(self):
+        return self.parts is not None
+
+    def render(self, context=None):
+        from django.template import Context
+        context = context or {}
+
+        if self.template is not None:
+            return self.template.render(Context(context))
+
+        parts = self.parts
+        if len(parts) == 1:
+            return parts[0]
+
+        from django.template.base import render_value_in_context
+
+        rendered = parts[:]
+        for index in range(1, len(parts), 2):
+            name = parts[index]
+            if name not in context:
+                # Как string_if_invalid по умолчанию
+                rendered[index] = ''
+                continue
+            value = context[name]
+            if type(value) is str:
+                # То же, что django.utils.html.escape, без обертки SafeString
+                rendered[index] = html.escape(value)
+            else:
+                rendered[index] = render_value_in_context(value, Context(autoescape=True))
+        return ''.join(rendered)
+
+
+class PlaceholderMessage:
+    """
+    Общее сообщение с подстановками {{ключ}}, разобранное один раз на литералы
+    и ключи. Строка собирается одним join; ключ, которого нет в значениях,
+    остается в тексте как есть, пустое значение (None) заменяется на ''.
+    Подставленные значения повторно не разбираются.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = PLACEHOLDER_RE.split(text)
+        self.placeholders = list(dict.fromkeys(self.parts[1::2]))
+        self._slots = [(index, self.parts[index]) for index in range(1, len(self.parts), 2)]
+        # Исходный вид {{ключ}} для ключей без значения
+        self._raw = {key: f'{{{{{key}}}}}' for key in self.placeholders}
+
+    @property
+    def is_static(self):
+        return not self._slots
+
+    def render(self, values):
+        if not self._slots:
+            return self.text
+
+        raw = self._raw
+        rendered = self.parts[:]
+        for index, key in self._slots:
+            if key in values:
+                rendered[index] = values[key] or ''
+            else:
+                rendered[index] = raw[key]
+        return ''.join(rendered)
+
+
+class TemplateCache:
+    """LRU скомпилированных шаблонов процесса по ключу (id шаблона, хэш текста)"""
+
+    def __init__(self, maxsize=TEMPLATE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template_id, content):
+        key = (template_id, content_hash(content))
+        with self._lock:
+            compiled = self._items.get(key)
+            if compiled is not None:
+                self._items.move_to_end(key)
+                return compiled
+
+        # Компиляция вне блокировки: в худшем случае шаблон скомпилируется дважды
+        compiled = CompiledTemplate(content)
+        with self._lock:
+            self._items[key] = compiled
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+template_cache = TemplateCache()
+
+
+def get_compiled_template(template):
+    """
+    Скомпилированный шаблон для MessageTemplate.
+    Хэш текста считается один раз на экземпляр, пока content не меняется.
+    """
+    content = template.content
+    cached = getattr(template, '_compiled_template', None)
+    if cached is not None and cached[0] is content:
+        return cached[1]
+
+    compiled = template_cache.get(template.pk, content)
+    template._compiled_template = (content, compiled)
+    return compiled
@@ -0,0 +1,112 @@
+# core/tests/test_list_queries.py
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ..models import CapsuleAttachment, CustomUser, MessageTemplate, TimeCapsule
+
+# Размеры страницы (строк на странице), при которых сравнивается число запросов
+PAGE_SIZES = (20, 5, 1)
+
+
+def keep_first(model, size):
+    """Оставить size первых строк модели (для списков с фиксированным размером страницы)"""
+    model.objects.exclude(pk__in=model.objects.order_by('pk').values('pk')[:size]).delete()
+
+
+# Без DEBUG включен SECURE_SSL_REDIRECT: запросы тестового клиента по HTTP получили бы 301
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ListQueryCountTests(TestCase):
+    """
+    Число SQL-запросов списков не зависит от числа строк на странице.
+    N+1 (запрос на каждую строку) дает разное число запросов и роняет тест.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('owner', 'owner@example.com', 'password')
+        scheduled_date = timezone.now() + timedelta(days=1)
+
+        capsules = TimeCapsule.objects.bulk_create([
+            TimeCapsule(
+                recipient_email=f'r{i}@example.com',
+                scheduled_date=scheduled_date,
+                encrypted_message='x',
+                created_by=cls.user,
+            )
+            for i in range(max(PAGE_SIZES))
+        ])
+        # По два вложения на капсулу: вложения страницы капсул грузятся одним запросом
+        CapsuleAttachment.objects.bulk_create([
+            CapsuleAttachment(capsule=capsule, file_name=f'{capsule.pk}-{i}.txt', file_size=1, file_type='text/plain')
+            for capsule in capsules
+            for i in range(2)
+        ])
+        MessageTemplate.objects.bulk_create([
+            MessageTemplate(name=f'Шаблон {i}', content='Привет, {{ name }}', created_by=cls.user)
+            for i in range(max(PAGE_SIZES))
+        ])
+
+    def setUp(self):
+        # Кэши аутентификации, лимитов и блокировок не должны влиять на счетчик
+        cache.clear()
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.client.force_login(self.user)
+
+    def assert_constant_queries(self, client, get_url, prepare=None, get_rows=None, max_rows=None):
+        """
+        Для каждого размера из PAGE_SIZES (по убыванию: prepare может удалять строки)
+        запрашивает get_url(size) и сравнивает число запросов.
+        """
+        get_rows = get_rows or (lambda response: response.json()['results'])
+        counts = {}
+        for size in PAGE_SIZES:
+            if prepare:
+                prepare(size)
+            url = get_url(size)
+            # Первый запрос прогревает кэши процесса, считается второй
+            client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(get_rows(response)), min(size, max_rows or size))
+            counts[size] = len(queries)
+
+        self.assertEqual(len(set(counts.values())), 1, f"Число запросов зависит от размера страницы: {counts}")
+
+    def test_capsule_list(self):
+        url = reverse('capsule-list')
+        self.assert_constant_queries(self.api, lambda size: f'{url}?page_size={size}')
+
+    def test_capsule_list_with_count_estimate(self):
+        url = reverse('capsule-list')
+        self.assert_constant_queries(self.api, lambda size: f'{url}?page_size={size}&count=estimate')
+
+    def test_attachment_list(self):
+        # Размер страницы фиксирован (PAGE_SIZE), меняется число вложений пользователя
+        url = reverse('attachment-list')
+        self.assert_constant_queries(
+            self.api, lambda size: url, prepare=lambda size: keep_first(CapsuleAttachment, size)
+        )
+
+    def test_template_list(self):
+        url = reverse('template-list')
+        self.assert_constant_queries(
+            self.api, lambda size: url, prepare=lambda size: keep_first(MessageTemplate, size)
+        )
+
+    def test_capsule_list_page(self):
+        url = reverse('capsule_list')
+        self.assert_constant_queries(
+            self.client,
+            lambda size: url,
+            prepare=lambda size: keep_first(TimeCapsule, size),
+            get_rows=lambda response: response.context['capsules'],
+            max_rows=10,
+        )
@@ -0,0 +1,212 @@
+# core/uploads.py
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+import hashlib
+import tempfile
+import uuid
+import logging
+
+from .attachments import (
+    ATTACHMENT_CHUNK_SIZE, SPOOL_MAX_SIZE, adopt_blob, create_attachment, encrypt_blocks,
+    get_encrypted_block_size
+)
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(ValueError):
+    """Некорректная часть или параметры загрузки"""
+
+
+class UploadConflict(UploadError):
+    """Часть не по порядку или загрузка в неподходящем состоянии"""
+
+
+class HashingReader:
+    """Обертка над потоком: считает sha256 прочитанных байтов"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.hash = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.hash.update(data)
+        return data
+
+
+def get_upload_config():
+    config = getattr(settings, 'ATTACHMENT_UPLOADS', {})
+    # Часть - целое число блоков шифрования, иначе смещения в файле не совпадут
+    part_size = config.get('PART_SIZE', 4 * 1024 * 1024)
+    part_size = max(1, part_size // ATTACHMENT_CHUNK_SIZE) * ATTACHMENT_CHUNK_SIZE
+    return {
+        'part_size': part_size,
+        'max_size': config.get('MAX_SIZE', 2 * 1024 * 1024 * 1024),
+        'expire_hours': config.get('EXPIRE_HOURS', 24),
+    }
+
+
+def get_storage():
+    from .models import CapsuleAttachment
+    return CapsuleAttachment._meta.get_field('file').storage
+
+
+def start_upload(user, file_name, file_type, total_size):
+    """Создание сессии загрузки и пустого файла в хранилище"""
+    from .encryption import key_manager
+    from .models import AttachmentUpload
+
+    config = get_upload_config()
+    if total_size < 0 or total_size > config['max_size']:
+        raise UploadError(f"Размер файла должен быть от 0 до {config['max_size']} байт")
+
+    upload_id = uuid.uuid4()
+    storage_name = get_storage().save(
+        timezone.now().strftime('attachments/%Y/%m/%d/') + f"{upload_id.hex}.bin",
+        ContentFile(b'')
+    )
+
+    return AttachmentUpload.objects.create(
+        id=upload_id,
+        created_by=user,
+        file_name=file_name,
+        file_type=file_type or 'application/octet-stream',
+        total_size=total_size,
+        part_size=config['part_size'],
+        storage_name=storage_name,
+        encryption_key_id=key_manager.current_key_id,
+    )
+
+
+def append_part(upload, index, stream, length=None, expected_sha256=None):
+    """
+    Прием части index: хэширование и шифрование по мере чтения, затем дозапись
+    в файл хранилища. Часть шифруется без блокировок (в буфер), под блокировкой
+    строки только проверяется позиция и дописываются байты.
+    length - заявленный размер тела запроса (Content-Length), если известен.
+    Повтор уже принятой части ничего не меняет. Возвращает (upload, sha256 части).
+    """
+    from .encryption import key_manager
+    from .models import AttachmentUpload
+
+    if upload.status != 'uploading':
+        raise UploadConflict('Загрузка уже завершена')
+
+    expected = upload.next_part
+    if expected is None or index < expected:
+        return upload, None
+    if index != expected:
+        raise UploadConflict(f"Ожидается часть {expected}")
+
+    limit = min(upload.part_size, upload.total_size - upload.received_size)
+    if length is not None and length != limit:
+        raise UploadError(f"Размер части {index} должен быть {limit} байт")
+
+    received_size, content_hash = upload.received_size, upload.content_hash
+    fernet = key_manager.get_fernet(upload.encryption_key_id)
+    source = HashingReader(stream)
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE * 2) as buffer:
+        size, content_hash = encrypt_blocks(source, fernet, buffer, limit=limit, content_hash=content_hash)
+        # Без Content-Length читается не больше limit байт: остаток значит, что часть длиннее
+        if size != limit or (length is None and stream.read(1)):
+            raise UploadError(f"Размер части {index} должен быть {limit} байт")
+
+        part_sha256 = source.hash.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != part_sha256:
+            raise UploadError('Контрольная сумма части не совпадает')
+
+        with transaction.atomic():
+            upload = AttachmentUpload.objects.select_for_update().get(pk=upload.pk)
+            if upload.status != 'uploading' or upload.received_size != received_size:
+                # Параллельный запрос успел принять эту часть
+                return upload, part_sha256
+
+            # Все предыдущие части полные, поэтому смещение считается по блокам.
+            # Хвост от прерванной дозаписи отрезается.
+            offset = received_size // ATTACHMENT_CHUNK_SIZE * get_encrypted_block_size()
+            buffer.seek(0)
+            with get_storage().open(upload.storage_name, 'r+b') as out:
+                out.seek(offset)
+                out.truncate()
+                while True:
+                    data = buffer.read(ATTACHMENT_CHUNK_SIZE)
+                    if not data:
+                        break
+                    out.write(data)
+
+            upload.received_size += size
+            upload.content_hash = content_hash
+            upload.save(update_fields=['received_size', 'content_hash', 'updated_at'])
+
+    return upload, part_sha256
+
+
+def complete_upload(upload, capsule=None):
+    """Завершение загрузки. С capsule сразу создает вложение, иначе возвращает upload"""
+    from .models import AttachmentUpload
+
+    with transaction.atomic():
+        upload = AttachmentUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.received_size != upload.total_size:
+            raise UploadConflict(f"Получено {upload.received_size} из {upload.total_size} байт")
+
+        if upload.status != 'complete':
+            upload.status = 'complete'
+            upload.save(update_fields=['status', 'updated_at'])
+
+        if capsule is not None:
+            return attach_upload(upload, capsule)
+
+    return upload
+
+
+def attach_upload(upload, capsule):
+    """
+    Создание вложения из завершенной загрузки. Файл не копируется: он становится
+    блобом или удаляется, если такое содержимое уже хранится.
+    """
+    if upload.status != 'complete':
+        raise UploadConflict('Загрузка не завершена')
+
+    blob = adopt_blob(
+        upload.content_hash, upload.total_size, upload.encryption_key_id, upload.storage_name
+    )
+    attachment = create_attachment(capsule, blob, upload.file_name, upload.file_type)
+    upload.delete()
+    return attachment
+
+
+def upload_file(user, file):
+    """Загрузка файла целиком через тот же конвейер (один запрос)"""
+    upload = start_upload(user, file.name, file.content_type, file.size)
+    file.seek(0)
+    for index in range(upload.part_count):
+        upload, _ = append_part(upload, index, file)
+    return complete_upload(upload)
+
+
+def abort_upload(upload):
+    """Отмена загрузки с удалением файла из хранилища"""
+    get_storage().delete(upload.storage_name)
+    upload.delete()
+
+
+def purge_stale_uploads():
+    """Удаление брошенных загрузок (и не прикрепленных к капсулам) старше EXPIRE_HOURS"""
+    from .models import AttachmentUpload
+
+    cutoff = timezone.now() - timezone.timedelta(hours=get_upload_config()['expire_hours'])
+    stale = AttachmentUpload.objects.filter(updated_at__lt=cutoff)
+
+    deleted = 0
+    for upload in stale.iterator():
+        abort_upload(upload)
+        deleted += 1
+
+    if deleted:
+        logger.info(f"Удалено брошенных загрузок: {deleted}")
+    return deleted
@@ -18,9 +18,16 @@ urlpatterns = [
     # Статистика
     path('statistics/', views.statistics_dashboard, name='statistics'),
     path('api/statistics/', views.api_statistics, name='api_statistics'),
+    path('api/statistics/export/', views.export_statistics, name='export_statistics'),
+
+    # Безопасность
+    path('security/suspicious/', views.suspicious_requests, name='suspicious_requests'),
 
     # Массовое создание
     path('bulk-create/', views.bulk_create_capsules, name='bulk_create'),
+    path('bulk-create/report/<slug:report_id>/', views.bulk_import_report, name='bulk_import_report'),
+    path('bulk-create/jobs/<uuid:job_id>/', views.import_job_detail, name='import_job_detail'),
+    path('bulk-create/jobs/<uuid:job_id>/progress/', views.import_job_progress, name='import_job_progress'),
 
     # API эндпоинты
     path('api/upload/', views.upload_attachment, name='upload_attachment'),
@@ -4,15 +4,22 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.utils import timezone
 from django.views.generic import ListView
-from .models import TimeCapsule, CapsuleAttachment, MessageTemplate, CustomUser
+from .models import TimeCapsule, CapsuleAttachment, MessageTemplate, CustomUser, ImportJob
 from .forms import TimeCapsuleForm, SearchForm
+from .pagination import InvalidCursor, estimate_count, paginate_keyset
+from .export import EXPORT_DATASETS, EXPORT_FORMATS, stream_export
+from .import_validation import validate_csv
+from .imports import create_import_job, get_job_progress, get_report_name
+from .suspicious import suspicious_log
+from .stats import StatisticsCollector, get_cached_stats, stats_etag, stats_last_modified
+from .uploads import upload_file
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.views.decorators.csrf import csrf_exempt
-from django.http import JsonResponse
-import csv
+from django.views.decorators.http import condition
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 import json
-from io import TextIOWrapper
-from django.db import transaction
 
 
 def home(request):
@@ -52,7 +59,21 @@ class CapsuleListView(ListView):
 
     def get_queryset(self):
         # Показываем только капсулы текущего пользователя
-        return TimeCapsule.objects.filter(created_by=self.request.user).order_by('-created_at')
+        return TimeCapsule.objects.filter(created_by=self.request.user)
+
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset-пагинация по (created_at, id) вместо OFFSET и COUNT(*)"""
+        try:
+            page = paginate_keyset(queryset, self.request.GET.get('cursor'), page_size)
+        except InvalidCursor:
+            raise Http404('Неверный курсор')
+
+        # Оценка одна на все страницы фильтра: версионированный кэш сбрасывается
+        # при изменении капсул, поэтому COUNT/EXPLAIN не выполняется на каждой странице
+        page.count_estimate = get_cached_stats(
+            f"capsule_count_estimate:{self.request.user.pk}", lambda: estimate_count(queryset)
+        )
+        return None, page, page.object_list, page.has_next or page.has_previous
 
 
 @login_required
@@ -74,40 +95,64 @@ def resend_capsule(request, capsule_id):
     return redirect('capsule_list')
 
 
+def get_global_totals():
+    """Общая статистика по всем капсулам и пользователям"""
+    data = StatisticsCollector().get_status_totals()
+    data['total_users'] = CustomUser.objects.count()
+    return data
+
+
 @login_required
 @user_passes_test(lambda u: u.is_staff)
+@condition(etag_func=stats_etag, last_modified_func=stats_last_modified)
 def statistics_dashboard(request):
     """Дашборд статистики (только для администраторов)"""
-    # Простая статистика
+    totals = get_cached_stats('totals', get_global_totals)
+
     context = {
-        'total_capsules': TimeCapsule.objects.count(),
-        'total_users': CustomUser.objects.count(),
-        'pending_capsules': TimeCapsule.objects.filter(status='pending').count(),
-        'sent_capsules': TimeCapsule.objects.filter(status='sent').count(),
-        'failed_capsules': TimeCapsule.objects.filter(status='failed').count(),
+        'total_capsules': totals['total_capsules'],
+        'total_users': totals['total_users'],
+        'pending_capsules': totals['pending'],
+        'sent_capsules': totals['sent'],
+        'failed_capsules': totals['failed'],
         'title': 'Статистика ChronoMail'
     }
 
     return render(request, 'core/statistics.html', context)
 
 
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def suspicious_requests(request):
+    """Агрегаты подозрительных запросов по IP и пути (только для администраторов)"""
+    entries, dropped = suspicious_log.get_entries(limit=500)
+    return render(request, 'core/suspicious_requests.html', {
+        'entries': entries,
+        'dropped': dropped,
+        'title': 'Подозрительные запросы'
+    })
+
+
 @csrf_exempt
 @login_required
 def upload_attachment(request):
-    """Загрузка вложения через AJAX"""
+    """
+    Загрузка вложения через AJAX.
+    Файлы проходят через конвейер загрузки по частям (шифрование при записи),
+    возвращаемые id передаются в форму капсулы (upload_ids).
+    Для больших файлов и нестабильной связи - /api/uploads/.
+    """
     if request.method == 'POST' and request.FILES:
         try:
             files = []
             for file in request.FILES.getlist('files'):
-                # Временное сохранение информации о файле
-                file_info = {
-                    'name': file.name,
-                    'size': file.size,
-                    'type': file.content_type,
-                    'url': '#',  # В реальном приложении - URL загруженного файла
-                    'id': f'temp_{len(files)}'  # Временный ID
-                }
-                files.append(file_info)
+                upload = upload_file(request.user, file)
+                files.append({
+                    'name': upload.file_name,
+                    'size': upload.total_size,
+                    'type': upload.file_type,
+                    'id': str(upload.id),
+                })
 
             return JsonResponse({
                 'success': True,
@@ -215,82 +260,65 @@ def preview_capsule(request):
 
 @login_required
 def bulk_create_capsules(request):
-    """Массовое создание капсул из CSV"""
+    """Массовое создание капсул из CSV (импорт выполняется в фоне)"""
+    validation = None
     if request.method == 'POST':
         form = BulkCapsuleForm(request.POST, request.FILES, user=request.user)
 
-        if form.is_valid():
-            csv_file = form.cleaned_data['csv_file']
-            template_id = form.cleaned_data['template']
-            common_message = form.cleaned_data['common_message']
-
-            # Чтение CSV
-            decoded_file = TextIOWrapper(csv_file.file, encoding='utf-8')
-            csv_reader = csv.DictReader(decoded_file)
-
-            created_count = 0
-            error_count = 0
-            errors = []
-
-            with transaction.atomic():
-                for i, row in enumerate(csv_reader, 1):
-                    try:
-                        # Валидация строки
-                        if not row.get('email'):
-                            errors.append(f"Строка {i}: Отсутствует email")
-                            error_count += 1
-                            continue
-
-                        # Создание сообщения
-                        if template_id:
-                            template = MessageTemplate.objects.get(
-                                id=template_id,
-                                created_by=request.user
-                            )
-                            message = template.render(row)
-                        elif common_message:
-                            message = common_message
-                            # Подстановка значений из CSV
-                            for key, value in row.items():
-                                message = message.replace(f'{{{{{key}}}}}', value)
-                        else:
-                            errors.append(f"Строка {i}: Не указано сообщение")
-                            error_count += 1
-                            continue
-
-                        # Создание капсулы
-                        capsule = TimeCapsule(
-                            recipient_email=row['email'],
-                            scheduled_date=row.get('date') or form.cleaned_data['scheduled_date'],
-                            created_by=request.user
-                        )
-
-                        capsule.encrypt_message(message)
-                        capsule.save()
-
-                        created_count += 1
-
-                    except Exception as e:
-                        errors.append(f"Строка {i}: {str(e)}")
-                        error_count += 1
-
-            messages.success(
-                request,
-                f'Успешно создано {created_count} капсул. Ошибок: {error_count}.'
+        if form.is_valid() and 'dry_run' in request.POST:
+            # Пробный прогон: только сводка ошибок, файл не сохраняется
+            validation = validate_csv(
+                form.cleaned_data['csv_file'],
+                default_date=form.cleaned_data['scheduled_date'],
             )
-
-            if errors:
-                messages.warning(
-                    request,
-                    'Ошибки при обработке: ' + '; '.join(errors[:5]) +
-                    ('...' if len(errors) > 5 else '')
-                )
-
-            return redirect('capsule_list')
+        elif form.is_valid():
+            job = create_import_job(
+                request.user,
+                form.cleaned_data['csv_file'],
+                template=form.cleaned_data['template'],
+                common_message=form.cleaned_data['common_message'],
+                default_date=form.cleaned_data['scheduled_date'],
+            )
+            messages.info(request, 'Файл загружен, импорт запущен.')
+            return redirect('import_job_detail', job_id=job.pk)
     else:
         form = BulkCapsuleForm(user=request.user)
 
-    return render(request, 'core/bulk_create.html', {'form': form})
+    return render(request, 'core/bulk_create.html', {'form': form, 'validation': validation})
+
+
+@login_required
+def import_job_detail(request, job_id):
+    """Страница импорта с прогрессом (опрашивает import_job_progress)"""
+    job = get_object_or_404(ImportJob, pk=job_id, created_by=request.user)
+    return render(request, 'core/import_job.html', {
+        'job': job,
+        'title': 'Импорт капсул'
+    })
+
+
+@login_required
+def import_job_progress(request, job_id):
+    """Прогресс импорта (JSON, один SELECT по первичному ключу)"""
+    progress = get_job_progress(request.user, job_id)
+    if progress is None:
+        raise Http404('Импорт не найден')
+    return JsonResponse(progress)
+
+
+@login_required
+def bulk_import_report(request, report_id):
+    """Скачивание CSV-отчета об ошибках импорта (только своего)"""
+    name = get_report_name(request.user, report_id)
+    if not default_storage.exists(name):
+        raise Http404('Отчет не найден')
+
+    return FileResponse(
+        default_storage.open(name, 'rb'),
+        as_attachment=True,
+        filename=f"import_errors_{report_id[:8]}.csv",
+        content_type='text/csv; charset=utf-8'
+    )
 
 
 class BulkCapsuleForm(forms.Form):
@@ -352,24 +380,41 @@ def search_capsules(request):
 
 # API view для статистики (простая версия)
 @login_required
+@condition(etag_func=stats_etag, last_modified_func=stats_last_modified)
 def api_statistics(request):
     """API для статистики"""
-    from django.forms.models import model_to_dict
-
     if request.user.is_staff:
-        data = {
-            'total_capsules': TimeCapsule.objects.count(),
-            'total_users': CustomUser.objects.count(),
-            'pending': TimeCapsule.objects.filter(status='pending').count(),
-            'sent': TimeCapsule.objects.filter(status='sent').count(),
-            'failed': TimeCapsule.objects.filter(status='failed').count(),
-        }
+        data = get_cached_stats('totals', get_global_totals)
     else:
-        data = {
-            'total_capsules': TimeCapsule.objects.filter(created_by=request.user).count(),
-            'pending': TimeCapsule.objects.filter(created_by=request.user, status='pending').count(),
-            'sent': TimeCapsule.objects.filter(created_by=request.user, status='sent').count(),
-            'failed': TimeCapsule.objects.filter(created_by=request.user, status='failed').count(),
-        }
-
-    return JsonResponse(data)
\ No newline at end of file
+        data = get_cached_stats(
+            f"user_totals:{request.user.pk}",
+            lambda: StatisticsCollector().get_status_totals(user=request.user)
+        )
+
+    return JsonResponse(data)
+
+
+@login_required
+def export_statistics(request):
+    """Потоковый экспорт статистики (CSV/NDJSON) без загрузки данных в память"""
+    dataset = request.GET.get('dataset', 'rollups')
+    export_format = request.GET.get('format', 'csv')
+
+    if dataset not in EXPORT_DATASETS or export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': 'Неверный набор данных или формат'}, status=400)
+
+    # Агрегаты по всей системе доступны только администраторам
+    if dataset == 'rollups' and not request.user.is_staff:
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+
+    user = None if request.user.is_staff else request.user
+
+    response = StreamingHttpResponse(
+        stream_export(dataset, export_format, user=user),
+        content_type=EXPORT_FORMATS[export_format]
+    )
+    filename = f"chronomail_{dataset}_{timezone.now():%Y%m%d}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Отключаем буферизацию ответа в nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response